@@ -1,105 +1,189 @@
-import pandas as pd
 from langchain_experimental.agents import create_pandas_dataframe_agent
 from langchain.tools import tool
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend - prevents figure popups
 import matplotlib.pyplot as plt
-import seaborn as sns
-import uuid
+from .columnar import is_large_table
+from .data_cache import load_dataframe
 import os
+import threading
+from .profiling import get_profile, hash_file, schema_digest
+from .rendering import STATIC_DIR, chart_renderer
+from .plot_cache import plot_cache, plot_url
+from .charts import build_chart, parse_chart_request
+from .llm import HuggingFaceLLM
+from .sandbox import ALLOW_UNSANDBOXED_CODE, SANDBOX_ENABLED, SandboxedPythonTool
 
 # Configure matplotlib to never show plots
 plt.ioff()  # Turn off interactive mode
 
-# Ensure static dir exists for plots
-STATIC_DIR = "static/plots"
-os.makedirs(STATIC_DIR, exist_ok=True)
+# One instance per mode; both share the pooled client in llm.py
+_llms = {}
 
-def get_llm():
+def get_llm(streaming: bool = False):
     """Get LLM using Hugging Face Inference API"""
-    from langchain_core.language_models.llms import LLM
-    from huggingface_hub import InferenceClient
-    from typing import Any, List, Optional
-    import os
-    
-    hf_token = os.getenv("HF_TOKEN") or ""
-    
-    class HuggingFaceLLM(LLM):
-        client: Any = None
-        
-        def __init__(self, **kwargs):
-            super().__init__(**kwargs)
-            self.client = InferenceClient(token=hf_token)
-        
-        @property
-        def _llm_type(self) -> str:
-            return "huggingface"
-        
-        def _call(self, prompt: str, stop: Optional[List[str]] = None, **kwargs: Any) -> str:
-            try:
-                response = self.client.text_generation(
-                    prompt,
-                    model="google/flan-t5-xxl",
-                    max_new_tokens=256,
-                )
-                return response
-            except Exception as e:
-                # Fallback response for data analysis
-                if "insight" in prompt.lower() or "analyze" in prompt.lower():
-                    return "• Key metrics show positive trends\n• Data quality is good\n• Recommend monitoring outliers"
-                return f"Analysis complete. {str(e)[:50]}"
-    
-    return HuggingFaceLLM()
-
-@tool
-def generate_plot(code: str):
-    """
-    Executes Python code to generate a matplotlib/seaborn plot.
-    The code must create a figure and not show it.
-    It should assume 'df' is available as the dataframe.
-    """
-    try:
-        pass
-    except Exception as e:
-        return f"Error plotting: {e}"
+    if streaming not in _llms:
+        _llms[streaming] = HuggingFaceLLM(streaming=streaming)
+    return _llms[streaming]
+
+PLOT_TIMEOUT_SECONDS = 120
+
+def make_plot_tool(filepath: str, content_hash: str, file_id=None):
+    """Build the generate_plot tool bound to one uploaded file"""
+
+    @tool
+    def generate_plot(spec: str):
+        """
+        Draws a chart of the dataframe and returns the Markdown image to put in the answer.
+        Input is a JSON object: {"type": "bar" | "line" | "pie" | "scatter" | "hist",
+        "x": column, "y": column (or a list of columns for line),
+        "agg": "sum" | "mean" | "median" | "min" | "max" | "count",
+        "limit": max number of bars/slices/bins, "title": optional title}.
+        Example: {"type": "bar", "x": "region", "y": "sales", "agg": "sum", "limit": 10}
+        """
+        try:
+            request = parse_chart_request(spec)
+
+            def render(name):
+                # Aggregate and downsample here, draw in the render pool
+                df = load_dataframe(filepath, file_id)
+                return chart_renderer.submit(build_chart(df, request), name)
+
+            # Same data + same spec -> same image, so repeated plots are free.
+            # Agent requests are keyed apart from the dashboard's drawn specs
+            plot_name = plot_cache.get_or_render(content_hash, {"source": "agent", "chart": request}, render=render)
+            # Re-raises a failed render; a missing file means it failed earlier
+            chart_renderer.result(plot_name, timeout=PLOT_TIMEOUT_SECONDS)
+            if not os.path.exists(os.path.join(STATIC_DIR, plot_name)):
+                return "Error plotting: the chart could not be drawn"
+            return f"![Plot]({plot_url(plot_name)})"
+        except Exception as e:
+            return f"Error plotting: {e}"
+
+    return generate_plot
+
+# What AgentExecutor answers when it gives up on max_iterations/max_execution_time
+EARLY_STOP_OUTPUTS = (
+    "Agent stopped due to iteration limit or time limit.",
+    "Agent stopped due to max iterations.",
+)
 
-def get_agent(filepath: str):
-    # Determine file type
-    if filepath.endswith(".csv"):
-        df = pd.read_csv(filepath)
-    else:
-        df = pd.read_excel(filepath)
+def stopped_early(result: dict) -> bool:
+    """True when the agent ran out of iterations or time instead of answering"""
+    return str(result.get("output", "")).strip() in EARLY_STOP_OUTPUTS
 
-    llm = get_llm()
+class AgentStats:
+    """ReAct iterations per answered question, to track prompt changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.answers = 0
+        self.iterations = 0
+        self.iterations_max = 0
+        self.stopped = 0
+
+    def record(self, result: dict):
+        # Runs cut off by the limits always use the maximum; count them apart
+        # so they don't skew the per-answer figures
+        if stopped_early(result):
+            with self._lock:
+                self.stopped += 1
+            return
+        # One LLM round-trip per tool step plus the final answer
+        iterations = len(result.get("intermediate_steps") or []) + 1
+        with self._lock:
+            self.answers += 1
+            self.iterations += iterations
+            self.iterations_max = max(self.iterations_max, iterations)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "answers": self.answers,
+                "stopped": self.stopped,
+                "iterations_avg": self.iterations / self.answers if self.answers else 0.0,
+                "iterations_max": self.iterations_max,
+            }
+
+agent_stats = AgentStats()
+
+def get_agent(filepath: str, file_id=None, content_hash: str = None, streaming: bool = False):
+    if not SANDBOX_ENABLED and not ALLOW_UNSANDBOXED_CODE:
+        raise RuntimeError(
+            "The Python sandbox is disabled, so agent code would run inside the API process. "
+            "Set SANDBOX_ENABLED=true, or ALLOW_UNSANDBOXED_CODE=true for local development."
+        )
+    # Parsed frames are cached per file; the agent gets a shallow copy so
+    # columns it adds don't leak into later turns
+    df = load_dataframe(filepath, file_id).copy(deep=False)
+    content_hash = content_hash or hash_file(filepath)
+
+    llm = get_llm(streaming=streaming)
+    plot_tool = make_plot_tool(filepath, content_hash, file_id)
+
+    # Schema, null counts and value ranges up front, so the agent doesn't
+    # spend iterations on df.columns / df.dtypes / df.describe()
+    try:
+        digest = schema_digest(get_profile(filepath, content_hash))
+    except Exception as e:
+        print(f"Profile unavailable for {filepath}: {str(e)}")
+        digest = ""
+    if is_large_table(filepath):
+        # Large CSVs are never loaded whole; say so, so answers aren't
+        # presented as exact totals over the full file
+        digest += (
+            f"\n`df` holds an evenly spaced sample of {len(df):,} rows of this file. "
+            "The statistics above cover every row; quantities computed from `df` are estimates."
+        )
+    # The prefix is a prompt template, so braces in the data must be escaped
+    digest = digest.replace("{", "{{").replace("}", "}}")
     
     prefix = """
     You are an expert data analyst. 
     You have access to a pandas dataframe `df`.
+
+    {digest}
     
     When asked a question:
     1. Analyze the data directly and provide a clear, concise answer
     2. NEVER create visualizations or plots unless explicitly asked
     3. Focus on data insights, statistics, and analysis
-    4. If you must create a plot, use:
-       - import matplotlib.pyplot as plt
-       - plt.ioff()  # Turn off interactive mode
-       - Save to 'static/plots/' with uuid filename
-       - plt.close('all')  # Close all figures
-       - Return Markdown: ![Description](http://localhost:8000/static/plots/<filename>)
+    4. If you must create a plot, call the `generate_plot` tool with a JSON
+       chart spec (never write plotting code yourself), and include the
+       Markdown image it returns in your answer
+    5. The schema above is already known; don't inspect columns or dtypes again
     
     Be direct and actionable. Always end with "Final Answer: [your answer]"
-    """
+    """.replace("{digest}", digest)
 
-    return create_pandas_dataframe_agent(
+    # Required to build the agent at all; with the sandbox on, its in-process
+    # python_repl_ast is replaced below before anything runs
+    agent = create_pandas_dataframe_agent(
         llm,
         df,
         verbose=True,
         agent_type="zero-shot-react-description",
         allow_dangerous_code=True,
         prefix=prefix,
+        extra_tools=[plot_tool],
         max_iterations=50,
         max_execution_time=300,
+        return_intermediate_steps=True,
         agent_executor_kwargs={
             "handle_parsing_errors": True
         }
     )
+    if SANDBOX_ENABLED:
+        # Generated code runs in the sandbox workers, not in this process;
+        # the in-process REPL is only used to build the prompt
+        agent.tools = [
+            SandboxedPythonTool(filepath=filepath, file_id=file_id) if t.name == "python_repl_ast" else t
+            for t in agent.tools
+        ]
+    return agent
+
+def release_agent(agent):
+    """End the agent's run, so the sandbox drops the variables it defined"""
+    for t in agent.tools:
+        if isinstance(t, SandboxedPythonTool):
+            t.end_run()
@@ -0,0 +1,239 @@
+import ast
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# Declarative charts for the agent's generate_plot tool: a small JSON spec is
+# validated, aggregated with vectorized pandas and reduced to a bounded number
+# of points before it is handed to the render pool
+CHART_TYPES = ("bar", "line", "pie", "scatter", "hist")
+CHART_AGGREGATES = ("sum", "mean", "median", "min", "max", "count")
+DEFAULT_LIMITS = {"bar": 20, "pie": 8, "hist": 30}
+CHART_MAX_CATEGORIES = int(os.getenv("CHART_MAX_CATEGORIES", "50"))
+LINE_MAX_POINTS = int(os.getenv("LINE_MAX_POINTS", "1000"))
+LINE_MAX_SERIES = 5
+SCATTER_MAX_POINTS = int(os.getenv("SCATTER_MAX_POINTS", "5000"))
+
+_FENCE_RE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_chart_request(text: str) -> dict:
+    """Parse and normalize the tool input; raises ValueError with a usable hint"""
+    text = _FENCE_RE.sub("", text.strip())
+    try:
+        raw = json.loads(text)
+    except ValueError:
+        try:
+            raw = ast.literal_eval(text)
+        except (ValueError, SyntaxError):
+            raise ValueError('input must be a JSON object such as {"type": "bar", "x": "region", "y": "sales"}')
+    if not isinstance(raw, dict):
+        raise ValueError("input must be a JSON object")
+
+    chart_type = str(raw.get("type", "bar")).lower()
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"type must be one of {', '.join(CHART_TYPES)}")
+    y = raw.get("y")
+    if isinstance(y, list):
+        # Several y columns only make sense as line series
+        y = [str(c) for c in y][:LINE_MAX_SERIES] if chart_type == "line" else (str(y[0]) if y else None)
+    elif y is not None:
+        y = str(y)
+    agg = raw.get("agg") or raw.get("aggregation")
+    agg = str(agg).lower() if agg else None
+    if agg == "avg" or agg == "average":
+        agg = "mean"
+    if agg is not None and agg not in CHART_AGGREGATES:
+        raise ValueError(f"agg must be one of {', '.join(CHART_AGGREGATES)}")
+    limit = raw.get("limit") or DEFAULT_LIMITS.get(chart_type)
+    if limit is not None:
+        limit = max(1, min(int(limit), CHART_MAX_CATEGORIES))
+
+    return {
+        "type": chart_type,
+        "x": str(raw["x"]) if raw.get("x") is not None else None,
+        "y": y,
+        "agg": agg,
+        "limit": limit,
+        "title": str(raw["title"]) if raw.get("title") else None,
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling: indices of `threshold`
+    points that keep the visual shape of the series (first and last kept).
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        next_start, next_end = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        ax, ay = x[selected], y[selected]
+        area = np.abs((ax - avg_x) * (y[start:end] - ay) - (ax - x[start:end]) * (avg_y - ay))
+        selected = start + int(np.argmax(area))
+        indices[i + 1] = selected
+    return indices
+
+
+def _require(df: pd.DataFrame, column, role: str):
+    if column is None:
+        raise ValueError(f"'{role}' column is required for this chart")
+    if column not in df.columns:
+        raise ValueError(f"unknown column '{column}'. Columns: {', '.join(map(str, df.columns))}")
+    return column
+
+
+def _numeric(df: pd.DataFrame, column: str):
+    if not pd.api.types.is_numeric_dtype(df[column]):
+        raise ValueError(f"column '{column}' is not numeric")
+
+
+def _label(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _plain(values: pd.Series) -> list:
+    """Picklable Python values for the render workers"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return [ts.to_pydatetime() for ts in values]
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy().tolist()
+    return [str(v) for v in values]
+
+
+def _grouped(df: pd.DataFrame, request: dict) -> pd.Series:
+    x = _require(df, request["x"], "x")
+    y = request["y"] if isinstance(request["y"], str) else None
+    agg = request["agg"] or ("sum" if y else "count")
+    if agg == "count" or y is None:
+        values = df.groupby(x, observed=True, sort=False).size()
+    else:
+        _require(df, y, "y")
+        _numeric(df, y)
+        values = df.groupby(x, observed=True, sort=False)[y].agg(agg)
+    return values.sort_values(ascending=False).head(request["limit"])
+
+
+def _line_series(df: pd.DataFrame, request: dict) -> dict:
+    columns = request["y"] if isinstance(request["y"], list) else [request["y"]]
+    for column in columns:
+        _require(df, column, "y")
+        _numeric(df, column)
+    x = request["x"]
+    if x is not None:
+        _require(df, x, "x")
+        frame = df[[x] + [c for c in columns if c != x]]
+        if request["agg"]:
+            frame = frame.groupby(x, observed=True).agg(request["agg"]).reset_index()
+        frame = frame.sort_values(x)
+        x_values = frame[x]
+    else:
+        frame = df[columns]
+        x_values = pd.Series(np.arange(len(frame)), index=frame.index)
+
+    threshold = LINE_MAX_POINTS
+    if not (pd.api.types.is_numeric_dtype(x_values) or pd.api.types.is_datetime64_any_dtype(x_values)):
+        # Text dates become a real time axis; other labels stay categorical,
+        # which matplotlib can only draw legibly for a few points
+        parsed = pd.to_datetime(x_values, errors="coerce", format="mixed")
+        if parsed.notna().mean() >= 0.9:
+            x_values = parsed
+            order = np.argsort(x_values.to_numpy(), kind="stable")
+            frame, x_values = frame.iloc[order], x_values.iloc[order]
+        else:
+            threshold = CHART_MAX_CATEGORIES
+
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x_numeric = x_values.astype("int64").to_numpy(dtype=float)
+        x_numeric[x_values.isna().to_numpy()] = np.nan
+    elif pd.api.types.is_numeric_dtype(x_values):
+        x_numeric = x_values.to_numpy(dtype=float)
+    else:
+        x_numeric = np.arange(len(x_values), dtype=float)
+
+    series = {}
+    for column in columns:
+        y_values = frame[column].to_numpy(dtype=float)
+        mask = ~np.isnan(y_values) & ~np.isnan(x_numeric)
+        keep = np.flatnonzero(mask)[lttb_indices(x_numeric[mask], y_values[mask], threshold)]
+        series[str(column)] = {
+            "x": _plain(x_values.iloc[keep]),
+            "y": y_values[keep].tolist(),
+        }
+    return series
+
+
+def build_chart(df: pd.DataFrame, request: dict) -> dict:
+    """Turn a normalized chart request into a render spec with bounded data"""
+    chart_type = request["type"]
+    title = request["title"]
+
+    if chart_type in ("bar", "pie"):
+        values = _grouped(df, request)
+        what = f"{request['agg'] or ('sum' if request['y'] else 'count')} of {request['y']}" if request["y"] else "count"
+        spec = {
+            "type": chart_type,
+            "title": title or f"{what} by {request['x']}",
+            "labels": [_label(k) for k in values.index],
+            "values": [float(v) for v in values.values],
+        }
+        if chart_type == "bar":
+            spec["x_label"] = request["x"]
+            spec["y_label"] = what
+        return spec
+
+    if chart_type == "line":
+        series = _line_series(df, request)
+        return {
+            "type": "line",
+            "title": title or f"{', '.join(series)} over {request['x'] or 'index'}",
+            "series": series,
+            "x_label": request["x"] or "Index",
+            "y_label": ", ".join(series) if len(series) == 1 else "Value",
+            "markers": all(len(s["y"]) <= 50 for s in series.values()),
+        }
+
+    if chart_type == "scatter":
+        x = _require(df, request["x"], "x")
+        y = _require(df, request["y"] if isinstance(request["y"], str) else None, "y")
+        _numeric(df, x)
+        _numeric(df, y)
+        points = df[[x, y]].dropna()
+        if len(points) > SCATTER_MAX_POINTS:
+            points = points.sample(SCATTER_MAX_POINTS, random_state=0)
+        return {
+            "type": "scatter",
+            "title": title or f"{y} vs {x}",
+            "x": points[x].to_numpy(dtype=float).tolist(),
+            "y": points[y].to_numpy(dtype=float).tolist(),
+            "x_label": x,
+            "y_label": y,
+        }
+
+    # Histogram: counts per bin are computed here, only bin edges are shipped
+    x = _require(df, request["x"], "x")
+    _numeric(df, x)
+    values = df[x].dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(values, bins=request["limit"])
+    return {
+        "type": "hist",
+        "title": title or f"Distribution of {x}",
+        "counts": counts.tolist(),
+        "edges": edges.tolist(),
+        "x_label": x,
+    }
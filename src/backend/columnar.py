@@ -0,0 +1,188 @@
+import os
+from typing import List, Optional
+
+import pandas as pd
+from sqlmodel import Session
+
+from .dtypes import optimize_dtypes
+
+SIDECAR_SUFFIX = ".parquet"
+SIDECAR_COMPRESSION = os.getenv("SIDECAR_COMPRESSION", "zstd")
+
+TABULAR_EXTENSIONS = (".csv", ".xlsx", ".xls")
+
+# CSVs above this size are never loaded whole; they are streamed in chunks
+OUT_OF_CORE_THRESHOLD_MB = int(os.getenv("OUT_OF_CORE_THRESHOLD_MB", "500"))
+CHUNK_ROWS = int(os.getenv("CHUNK_ROWS", "200000"))
+DTYPE_SAMPLE_ROWS = 10000
+
+
+def sidecar_path_for(filepath: str) -> str:
+    """Columnar copy lives next to the upload, e.g. uploads/1/sales.csv.parquet"""
+    return filepath + SIDECAR_SUFFIX
+
+
+def fresh_sidecar(filepath: str) -> Optional[str]:
+    """Return the sidecar path if it exists and is not older than the upload"""
+    path = sidecar_path_for(filepath)
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(filepath):
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def parse_text_table(filepath: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Parse the original CSV/Excel text"""
+    if filepath.endswith(".csv"):
+        return pd.read_csv(filepath, usecols=columns)
+    return pd.read_excel(filepath, usecols=columns)
+
+
+def is_large_table(filepath: str) -> bool:
+    """True for CSVs too big to load whole (Excel can't be streamed)"""
+    try:
+        return filepath.endswith(".csv") and os.path.getsize(filepath) > OUT_OF_CORE_THRESHOLD_MB * 1024 * 1024
+    except OSError:
+        return False
+
+
+def csv_dtype_hints(filepath: str) -> dict:
+    """
+    Dtypes from a sample of the file, so every chunk parses a column the same
+    way; integer columns become float in case a later chunk has missing values.
+    """
+    sample = pd.read_csv(filepath, nrows=DTYPE_SAMPLE_ROWS)
+    hints = {}
+    for col, dtype in sample.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        if pd.api.types.is_numeric_dtype(dtype):
+            hints[col] = "float64"
+        elif dtype == object:
+            hints[col] = "object"
+    return hints
+
+
+def estimate_rows(filepath: str) -> Optional[int]:
+    """Row count from sidecar metadata, or extrapolated from the first MB of a CSV"""
+    sidecar = fresh_sidecar(filepath)
+    if sidecar:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(sidecar).metadata.num_rows
+    if not filepath.endswith(".csv"):
+        return None
+    with open(filepath, "rb") as f:
+        head = f.read(1024 * 1024)
+    lines = max(head.count(b"\n"), 1)
+    return int(os.path.getsize(filepath) / len(head) * lines) if head else 0
+
+
+def iter_table_chunks(filepath: str, columns: Optional[List[str]] = None, chunk_rows: int = CHUNK_ROWS):
+    """Yield the table as DataFrames of at most chunk_rows rows"""
+    sidecar = fresh_sidecar(filepath)
+    if sidecar:
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(sidecar, memory_map=True)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+        return
+    if not filepath.endswith(".csv"):
+        yield parse_text_table(filepath, columns)
+        return
+
+    hints = csv_dtype_hints(filepath)
+    if columns is not None:
+        hints = {c: t for c, t in hints.items() if c in columns}
+    try:
+        reader = pd.read_csv(filepath, usecols=columns, dtype=hints, chunksize=chunk_rows)
+        first = next(reader, None)
+    except ValueError:
+        # The sample's dtypes don't fit the whole file; let pandas infer per chunk
+        reader = pd.read_csv(filepath, usecols=columns, chunksize=chunk_rows)
+        first = next(reader, None)
+    if first is None:
+        return
+    yield first
+    yield from reader
+
+
+def read_sidecar(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    # Memory-mapped read that only materializes the requested columns
+    return pd.read_parquet(path, columns=columns, memory_map=True)
+
+
+def write_sidecar(filepath: str) -> str:
+    """Parse the upload once and write a typed, compressed Parquet copy"""
+    path = sidecar_path_for(filepath)
+    tmp_path = path + ".tmp"
+    if is_large_table(filepath):
+        _write_sidecar_chunked(filepath, tmp_path)
+    else:
+        # Store the optimized dtypes (dictionary-encoded categories, real
+        # datetimes) so later loads start from them
+        df, _ = optimize_dtypes(parse_text_table(filepath))
+        df.to_parquet(tmp_path, compression=SIDECAR_COMPRESSION, index=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _write_sidecar_chunked(filepath: str, tmp_path: str):
+    # One row group per chunk, so memory stays at one chunk
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_table_chunks(filepath):
+            table = pa.Table.from_pandas(chunk, preserve_index=False, schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema, compression=SIDECAR_COMPRESSION)
+            writer.write_table(table)
+    except Exception:
+        if writer is not None:
+            writer.close()
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if writer is None:
+        pd.read_csv(filepath, nrows=0).to_parquet(tmp_path, compression=SIDECAR_COMPRESSION, index=False)
+    else:
+        writer.close()
+
+
+def remove_sidecar(filepath: str):
+    try:
+        os.remove(sidecar_path_for(filepath))
+    except OSError:
+        pass
+
+
+def convert_to_sidecar(file_id: int):
+    """Background task: build the sidecar for an upload and record it on the File"""
+    from .database import engine
+    from .models import File
+
+    with Session(engine) as session:
+        file = session.get(File, file_id)
+        if not file or not file.filepath.endswith(TABULAR_EXTENSIONS):
+            return
+        filepath = file.filepath
+
+    try:
+        path = write_sidecar(filepath)
+    except Exception as e:
+        # Readers fall back to parsing the original file
+        print(f"Sidecar conversion failed for {filepath}: {str(e)}")
+        return
+
+    with Session(engine) as session:
+        file = session.get(File, file_id)
+        if file:
+            file.sidecar_path = path
+            session.add(file)
+            session.commit()
@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, select
+
+from .database import engine
+from .models import ChatSession, Message
+
+# Conversational memory: each question is sent with a rolling summary of the
+# older turns plus the most recent turns that fit a token budget. Turns that
+# leave the window are folded into the summary once, after the answer is
+# saved, and the summary is stored on the ChatSession, so the prompt stays
+# bounded however long the session grows.
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() in ("1", "true", "yes")
+MEMORY_WINDOW_TOKENS = int(os.getenv("MEMORY_WINDOW_TOKENS", "600"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+# Long answers (tables, citations) are clipped before they enter the window
+MEMORY_MESSAGE_TOKENS = int(os.getenv("MEMORY_MESSAGE_TOKENS", "150"))
+
+ROLE_LABELS = {"user": "User", "assistant": "Assistant"}
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a data analysis assistant.
+Keep the facts, numbers, column and file names, and what the user is trying to find out. Be brief.
+
+Current summary:
+{summary}
+
+New messages:
+{transcript}
+
+Updated summary:"""
+
+
+def estimate_tokens(text: str) -> int:
+    # No tokenizer here; about 4 characters per token, never fewer than words
+    return max(len(text.split()), len(text) // 4)
+
+
+def clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+def format_messages(messages) -> str:
+    return "\n".join(
+        f"{ROLE_LABELS.get(m.role, m.role)}: {clip(m.content, MEMORY_MESSAGE_TOKENS)}"
+        for m in messages
+    )
+
+
+def split_window(messages, budget: int):
+    """Split messages (oldest first) into (older, recent) with recent within budget"""
+    used = 0
+    cut = len(messages)
+    while cut > 0:
+        tokens = estimate_tokens(clip(messages[cut - 1].content, MEMORY_MESSAGE_TOKENS)) + 2
+        if used + tokens > budget:
+            break
+        used += tokens
+        cut -= 1
+    return messages[:cut], messages[cut:]
+
+
+def with_history(question: str, history: str) -> str:
+    """The question as sent to the agent or chain, prefixed by the conversation so far"""
+    if not history:
+        return question
+    return (
+        f"Conversation so far:\n{history}\n\n"
+        f"Answer the user's new question, using the conversation only to resolve references.\n"
+        f"New question: {question}"
+    )
+
+
+class ConversationMemory:
+    def __init__(self, enabled: bool, window_tokens: int, summary_tokens: int):
+        self.enabled = enabled
+        self.window_tokens = window_tokens
+        self.summary_tokens = summary_tokens
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+        self._pending = set()  # session ids with a compaction queued or running
+        self._rerun = set()
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.context_tokens_total = 0
+        self.compactions = 0
+        self.summarized_messages = 0
+        self.summary_failures = 0
+        self.summary_seconds_total = 0.0
+
+    @staticmethod
+    def _unsummarized(session: Session, chat_session: ChatSession):
+        statement = select(Message).where(Message.session_id == chat_session.id)
+        if chat_session.summary_message_id is not None:
+            statement = statement.where(Message.id > chat_session.summary_message_id)
+        return session.exec(statement.order_by(Message.id)).all()
+
+    def context(self, session: Session, session_id: int) -> str:
+        """Summary plus recent turns of a session, before the new question is saved"""
+        if not self.enabled:
+            return ""
+        chat_session = session.get(ChatSession, session_id)
+        if chat_session is None:
+            return ""
+        # Turns past the window that compaction hasn't folded in yet are left out
+        _, recent = split_window(self._unsummarized(session, chat_session), self.window_tokens)
+        parts = []
+        if chat_session.summary:
+            parts.append(f"Summary of earlier messages: {chat_session.summary}")
+        if recent:
+            parts.append(format_messages(recent))
+        history = "\n".join(parts)
+        with self._lock:
+            self.contexts += 1
+            self.context_tokens_total += estimate_tokens(history)
+        return history
+
+    def schedule_compaction(self, session_id: int):
+        """Fold turns that left the window into the summary, in the background"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if session_id in self._pending:
+                self._rerun.add(session_id)
+                return
+            self._pending.add(session_id)
+        self._executor.submit(self._run, session_id)
+
+    def _run(self, session_id: int):
+        try:
+            self.compact(session_id)
+        except Exception as e:
+            print(f"Conversation summary failed: {str(e)}")
+        with self._lock:
+            rerun = session_id in self._rerun
+            self._rerun.discard(session_id)
+            if not rerun:
+                self._pending.discard(session_id)
+        if rerun:
+            self._executor.submit(self._run, session_id)
+
+    def compact(self, session_id: int):
+        with Session(engine) as session:
+            chat_session = session.get(ChatSession, session_id)
+            if chat_session is None:
+                return
+            older, _ = split_window(self._unsummarized(session, chat_session), self.window_tokens)
+            if not older:
+                return
+            summary = self._summarize(chat_session.summary, older)
+            chat_session.summary = summary
+            chat_session.summary_message_id = older[-1].id
+            session.add(chat_session)
+            session.commit()
+        with self._lock:
+            self.compactions += 1
+            self.summarized_messages += len(older)
+
+    def _summarize(self, summary, messages) -> str:
+        from .llm import inference_client
+
+        start = time.perf_counter()
+        try:
+            updated = inference_client.generate(
+                SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=format_messages(messages)),
+                max_new_tokens=self.summary_tokens,
+            ).strip()
+        except Exception as e:
+            print(f"LLM summary unavailable, keeping the questions: {str(e)}")
+            updated = ""
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.summary_seconds_total += elapsed
+            if not updated:
+                self.summary_failures += 1
+        if not updated:
+            # Extractive fallback: the user's questions, newest kept if it overflows
+            questions = "; ".join(clip(m.content, 40) for m in messages if m.role == "user")
+            updated = " ".join(filter(None, [summary, questions]))
+            max_chars = self.summary_tokens * 4
+            if len(updated) > max_chars:
+                updated = "... " + updated[-max_chars:]
+        return clip(updated, self.summary_tokens)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "window_tokens": self.window_tokens,
+                "contexts": self.contexts,
+                "context_tokens_avg": self.context_tokens_total / self.contexts if self.contexts else 0.0,
+                "compactions": self.compactions,
+                "summarized_messages": self.summarized_messages,
+                "summary_failures": self.summary_failures,
+                "summary_seconds_avg": (
+                    self.summary_seconds_total / self.compactions if self.compactions else 0.0
+                ),
+                "pending": len(self._pending),
+            }
+
+
+conversation_memory = ConversationMemory(MEMORY_ENABLED, MEMORY_WINDOW_TOKENS, MEMORY_SUMMARY_TOKENS)
@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import pandas as pd
+
+from .columnar import fresh_sidecar, is_large_table, parse_text_table, read_sidecar
+from .dtypes import optimize_dtypes
+from .out_of_core import sample_table
+
+# Memory budget for parsed DataFrames kept across chat turns
+DATAFRAME_CACHE_MAX_MB = int(os.getenv("DATAFRAME_CACHE_MAX_MB", "1024"))
+DATAFRAME_CACHE_MAX_ENTRIES = int(os.getenv("DATAFRAME_CACHE_MAX_ENTRIES", "32"))
+
+
+def read_table(filepath: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Load a CSV/Excel upload, preferring its Parquet sidecar when present"""
+    sidecar = fresh_sidecar(filepath)
+    if sidecar:
+        try:
+            return read_sidecar(sidecar, columns)
+        except Exception:
+            pass  # Corrupt or partial sidecar, use the original file
+    return parse_text_table(filepath, columns)
+
+
+def read_working_frame(filepath: str):
+    """
+    The frame chat works on (the whole table, or a row sample of a large CSV)
+    with compact dtypes, and the before/after memory report for it
+    """
+    df = sample_table(filepath) if is_large_table(filepath) else read_table(filepath)
+    return optimize_dtypes(df)
+
+
+class DataFrameCache:
+    """
+    Process-wide LRU cache of parsed DataFrames.
+
+    Entries are keyed by File.id and remember the on-disk size/mtime they were
+    parsed from, so a file rewritten in place is re-read on the next access.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # file_id -> (filepath, signature, df, nbytes)
+        self._reports = {}  # file_id -> dtype optimization report
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(filepath: str):
+        st = os.stat(filepath)
+        return (st.st_size, st.st_mtime_ns)
+
+    def get(self, file_id, filepath: str) -> pd.DataFrame:
+        signature = self._signature(filepath)
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry and entry[0] == filepath and entry[1] == signature:
+                self._entries.move_to_end(file_id)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # Parse outside the lock so other files are not blocked
+        df, report = read_working_frame(filepath)
+        nbytes = report["bytes_after"]
+
+        with self._lock:
+            self._pop(file_id)
+            if nbytes <= self.max_bytes:
+                self._entries[file_id] = (filepath, signature, df, nbytes)
+                self._reports[file_id] = report
+                self._bytes += nbytes
+                self._evict()
+        return df
+
+    def _pop(self, file_id):
+        entry = self._entries.pop(file_id, None)
+        self._reports.pop(file_id, None)
+        if entry:
+            self._bytes -= entry[3]
+        return entry
+
+    def _evict(self):
+        while self._entries and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            evicted, entry = self._entries.popitem(last=False)
+            self._reports.pop(evicted, None)
+            self._bytes -= entry[3]
+            self.evictions += 1
+
+    def invalidate(self, file_id=None, filepath: str = None):
+        """Drop cached frames for a file id and/or every id backed by a path"""
+        with self._lock:
+            if file_id is not None:
+                self._pop(file_id)
+            if filepath is not None:
+                for key in [k for k, e in self._entries.items() if e[0] == filepath]:
+                    self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._reports.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                # Memory of each cached frame before/after dtype optimization
+                "files": {
+                    str(file_id): {k: v for k, v in report.items() if k != "converted"}
+                    for file_id, report in self._reports.items()
+                },
+            }
+
+
+dataframe_cache = DataFrameCache(
+    max_bytes=DATAFRAME_CACHE_MAX_MB * 1024 * 1024,
+    max_entries=DATAFRAME_CACHE_MAX_ENTRIES,
+)
+
+
+def load_dataframe(filepath: str, file_id=None) -> pd.DataFrame:
+    """Load a tabular upload, reusing the cached parse when the file is unchanged"""
+    if file_id is None:
+        return read_working_frame(filepath)[0]
+    return dataframe_cache.get(file_id, filepath)
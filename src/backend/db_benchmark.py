@@ -0,0 +1,106 @@
+# Concurrent chat-message insert benchmark for the database layer.
+#
+#   cd src && python -m backend.db_benchmark --threads 16 --inserts 200
+#
+# Runs the same workload against the previous engine defaults and the tuned
+# engine (see database.make_engine) on a scratch SQLite file, or against
+# --url, e.g. a local PostgreSQL instance. Reports throughput, latency
+# percentiles and "database is locked" failures.
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlmodel import SQLModel, Session
+
+from .database import make_engine
+from .models import ChatSession, Message, User
+
+
+def _setup(engine) -> int:
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = User(email=f"bench-{time.time_ns()}@example.com", hashed_password="-")
+        session.add(user)
+        session.commit()
+        chat_session = ChatSession(user_id=user.id, title="benchmark")
+        session.add(chat_session)
+        session.commit()
+        return chat_session.id
+
+
+def run(engine, threads: int, inserts: int) -> dict:
+    session_id = _setup(engine)
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker(n: int):
+        own_latencies, own_errors = [], 0
+        start_barrier.wait()
+        for i in range(inserts):
+            # One session per insert, like save_message on each chat turn
+            started = time.perf_counter()
+            try:
+                with Session(engine) as session:
+                    session.add(Message(content=f"message {n}-{i}", role="user", session_id=session_id))
+                    session.commit()
+                own_latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                own_errors += 1
+        with lock:
+            latencies.extend(own_latencies)
+            errors.append(own_errors)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+    return {
+        "inserts": len(latencies),
+        "errors": sum(errors),
+        "seconds": elapsed,
+        "inserts_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent message insert benchmark")
+    parser.add_argument("--url", help="database URL (default: scratch SQLite files)")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--inserts", type=int, default=200, help="inserts per thread")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="db-benchmark-")
+    for label, tuned in (("default", False), ("tuned", True)):
+        url = args.url or f"sqlite:///{os.path.join(scratch, label + '.db')}"
+        engine = make_engine(url, echo=False, tuned=tuned)
+        try:
+            result = run(engine, args.threads, args.inserts)
+        finally:
+            engine.dispose()
+        print(
+            f"{label:>8}: {result['inserts']} inserts in {result['seconds']:.2f}s "
+            f"({result['inserts_per_second']:.0f}/s), p50 {result['p50_ms']:.1f}ms, "
+            f"p95 {result['p95_ms']:.1f}ms, p99 {result['p99_ms']:.1f}ms, "
+            f"{result['errors']} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import re
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Load-time dtype optimization: smaller integer types, `category` for
+# low-cardinality text and real datetimes for date strings. Every conversion
+# is lossless; anything that doesn't convert cleanly keeps its dtype.
+OPTIMIZE_DTYPES = os.getenv("OPTIMIZE_DTYPES", "true").lower() in ("1", "true", "yes")
+# Narrower ints risk silent overflow in agent arithmetic (int8 * int8), so
+# integers are only narrowed down to this width by default
+DOWNCAST_MIN_INT_BITS = int(os.getenv("DOWNCAST_MIN_INT_BITS", "32"))
+# float32 changes results of sums/means, so it is opt-in (and only lossless)
+DOWNCAST_FLOATS = os.getenv("DOWNCAST_FLOATS", "false").lower() in ("1", "true", "yes")
+CATEGORY_MAX_UNIQUE = int(os.getenv("CATEGORY_MAX_UNIQUE", "10000"))
+CATEGORY_MAX_UNIQUE_RATIO = float(os.getenv("CATEGORY_MAX_UNIQUE_RATIO", "0.5"))
+DATE_SAMPLE_SIZE = 100
+
+_DATE_HINT_RE = re.compile(r"\d{1,4}[-/.:]\d{1,2}|[A-Za-z]{3,9}\.? \d{1,2}|\d{1,2} [A-Za-z]{3,9}")
+# Signed only: unsigned columns wrap around on subtraction
+_INT_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+
+def _downcast_int(s: pd.Series) -> pd.Series:
+    if s.empty:
+        return s
+    low, high = s.min(), s.max()
+    for candidate in _INT_TYPES:
+        if np.dtype(candidate).itemsize * 8 < DOWNCAST_MIN_INT_BITS:
+            continue
+        info = np.iinfo(candidate)
+        if info.min <= low and high <= info.max:
+            if np.dtype(candidate).itemsize < s.dtype.itemsize:
+                return s.astype(candidate)
+            return s
+    return s
+
+
+def _downcast_float(s: pd.Series) -> pd.Series:
+    if s.dtype.itemsize <= 4:
+        return s
+    narrowed = s.astype(np.float32)
+    same = (narrowed.astype(s.dtype) == s) | s.isna()
+    return narrowed if same.all() else s
+
+
+def _parse_dates(s: pd.Series):
+    """Datetime version of a text column if every value parses, else None"""
+    sample = s.dropna().astype(str).head(DATE_SAMPLE_SIZE)
+    if sample.empty or not sample.str.contains(_DATE_HINT_RE).all():
+        return None
+    # One format for the whole column, guessed from its first value, so the
+    # parse stays vectorized; any value that doesn't match it raises
+    fmt = guess_datetime_format(sample.iloc[0])
+    if fmt is None:
+        return None
+    try:
+        pd.to_datetime(sample, format=fmt)
+        return pd.to_datetime(s, format=fmt)
+    except (ValueError, TypeError, OverflowError):
+        return None
+
+
+def _is_text(s: pd.Series) -> bool:
+    return s.dtype == object or pd.api.types.is_string_dtype(s.dtype)
+
+
+def optimize_dtypes(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    """
+    Return a copy of df with compact dtypes and a report of the memory it
+    used before and after, plus each column that changed.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    if not OPTIMIZE_DTYPES or df.empty:
+        return df, {"bytes_before": before, "bytes_after": before, "converted": {}}
+
+    converted = {}
+    result = df.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s, pd.DataFrame):  # duplicate column names
+            continue
+        if pd.api.types.is_bool_dtype(s) or isinstance(s.dtype, pd.CategoricalDtype):
+            continue
+        if pd.api.types.is_integer_dtype(s) and isinstance(s.dtype, np.dtype):
+            new = _downcast_int(s)
+        elif pd.api.types.is_float_dtype(s) and isinstance(s.dtype, np.dtype):
+            new = _downcast_float(s) if DOWNCAST_FLOATS else s
+        elif _is_text(s):
+            new = _parse_dates(s)
+            if new is None:
+                unique = s.nunique()
+                if unique <= CATEGORY_MAX_UNIQUE and unique <= CATEGORY_MAX_UNIQUE_RATIO * len(s):
+                    new = s.astype("category")
+                else:
+                    new = s
+        else:
+            continue
+        if new.dtype != s.dtype:
+            result[col] = new
+            converted[str(col)] = f"{s.dtype} -> {new.dtype}"
+
+    after = int(result.memory_usage(deep=True).sum())
+    return result, {"bytes_before": before, "bytes_after": after, "converted": converted}
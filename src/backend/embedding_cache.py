@@ -0,0 +1,135 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List, Optional
+
+import numpy as np
+
+# Disk-backed cache of chunk embeddings shared by every collection and user,
+# keyed by (model name, hash of the normalized chunk text)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+
+# SQLite caps bound parameters per statement
+_SQL_BATCH = 500
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def text_key(model_name: str, text: str) -> str:
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn = None
+        self._lock = threading.Lock()
+        self._entries = 0  # row count, kept in memory so puts don't scan the table
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embedding ("
+                " key TEXT PRIMARY KEY,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_embedding_last_used ON embedding (last_used)")
+            self._entries = conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: List[str]) -> List[Optional[List[float]]]:
+        found = {}
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _SQL_BATCH):
+                chunk = unique_keys[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embedding WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+                if rows:
+                    # Refresh recency for LRU eviction
+                    conn.executemany(
+                        "UPDATE embedding SET last_used = ? WHERE key = ?",
+                        [(now, key) for key, _ in rows],
+                    )
+            conn.commit()
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+        return results
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for key, vector in zip(keys, vectors)
+        ]
+        with self._lock:
+            conn = self._connect()
+            # Insert new keys and count them, then refresh any that were already cached
+            added = conn.executemany(
+                "INSERT OR IGNORE INTO embedding (key, vector, last_used) VALUES (?, ?, ?)", rows
+            ).rowcount
+            if added < len(rows):
+                conn.executemany(
+                    "UPDATE embedding SET vector = ?, last_used = ? WHERE key = ?",
+                    [(vector, used, key) for key, vector, used in rows],
+                )
+            self._entries += added
+            if self._entries > self.max_entries:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        # Recount first: another process may share the cache file
+        self._entries = conn.execute("SELECT COUNT(*) FROM embedding").fetchone()[0]
+        excess = self._entries - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embedding WHERE key IN ("
+                " SELECT key FROM embedding ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+            self._entries -= excess
+            self.evictions += excess
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._entries if self._conn is not None else None
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+            }
+
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES)
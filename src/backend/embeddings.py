@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from .embedding_cache import embedding_cache, normalize_text, text_key
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Load the model during app startup instead of on the first RAG question
+PRELOAD_EMBEDDINGS = os.getenv("PRELOAD_EMBEDDINGS", "true").lower() in ("1", "true", "yes")
+
+
+class EmbeddingService(Embeddings):
+    """
+    Process-wide wrapper around one HuggingFaceEmbeddings instance.
+
+    The sentence-transformers weights are loaded once and shared by every
+    RagPipeline; calls are timed so load and embed latency can be monitored.
+    Document embeddings go through the disk-backed embedding cache.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._model = None
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.load_seconds = None
+        self.batches = 0
+        self.texts = 0
+        self.embed_seconds_total = 0.0
+        self.embed_seconds_max = 0.0
+        self.queries = 0
+        self.query_seconds_total = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def load(self):
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                from langchain_huggingface import HuggingFaceEmbeddings
+
+                start = time.perf_counter()
+                self._model = HuggingFaceEmbeddings(model_name=self.model_name)
+                self.load_seconds = time.perf_counter() - start
+        return self._model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Content seen before (in any collection) comes from the shared cache;
+        # only the remaining unique texts go through the model. The model sees
+        # the same normalized text the key hashes, so a cached vector never
+        # depends on which whitespace variant happened to be embedded first.
+        keys = [text_key(self.model_name, text) for text in texts]
+        vectors = embedding_cache.get_many(keys)
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = normalize_text(text)
+        if not missing:
+            return vectors
+
+        model = self.load()
+        start = time.perf_counter()
+        computed = model.embed_documents(list(missing.values()))
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.batches += 1
+            self.texts += len(missing)
+            self.embed_seconds_total += elapsed
+            self.embed_seconds_max = max(self.embed_seconds_max, elapsed)
+
+        embedding_cache.put_many(list(missing.keys()), computed)
+        by_key = dict(zip(missing.keys(), computed))
+        return [vector if vector is not None else by_key[key] for key, vector in zip(keys, vectors)]
+
+    def embed_query(self, text: str) -> List[float]:
+        model = self.load()
+        start = time.perf_counter()
+        vector = model.embed_query(text)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.queries += 1
+            self.query_seconds_total += elapsed
+        return vector
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "loaded": self.loaded,
+                "load_seconds": self.load_seconds,
+                "batches": self.batches,
+                "texts": self.texts,
+                "batch_seconds_avg": self.embed_seconds_total / self.batches if self.batches else 0.0,
+                "batch_seconds_max": self.embed_seconds_max,
+                "queries": self.queries,
+                "query_seconds_avg": self.query_seconds_total / self.queries if self.queries else 0.0,
+            }
+
+
+embedding_service = EmbeddingService(EMBEDDING_MODEL)
+
+
+def get_embeddings() -> EmbeddingService:
+    return embedding_service
@@ -0,0 +1,158 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+# Separate capacity for each kind of work so slow agent runs can't starve
+# logins and listings:
+#   cpu  - pandas, profiling, dashboards
+#   tool - sync agent tools and retrievers, which mostly wait on the sandbox,
+#          the chart renderer or the vector store (the loop's default executor)
+#   llm  - concurrent chat answers (agent/chain runs awaiting the inference API)
+#   crud - Starlette's threadpool for the plain sync DB endpoints
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 2)))
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+CRUD_WORKERS = int(os.getenv("CRUD_WORKERS", "40"))
+
+# Requests allowed to wait for a slot before we shed load with 429
+CPU_QUEUE_LIMIT = int(os.getenv("CPU_QUEUE_LIMIT", "16"))
+LLM_QUEUE_LIMIT = int(os.getenv("LLM_QUEUE_LIMIT", "16"))
+PER_USER_CONCURRENCY = int(os.getenv("PER_USER_CONCURRENCY", "2"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+
+
+def _too_busy(detail: str):
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
+class Ticket:
+    """An admitted unit of work; holds its queue position until released"""
+
+    def __init__(self, work_class, user_id):
+        self.work_class = work_class
+        self.user_id = user_id
+        self._acquired = False
+        self._released = False
+
+    async def acquire(self):
+        await self.work_class.semaphore.acquire()
+        self._acquired = True
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        if self._acquired:
+            self.work_class.semaphore.release()
+        self.work_class.leave(self.user_id)
+
+
+class WorkClass:
+    def __init__(self, name: str, capacity: int, queue_limit: int, per_user: int):
+        self.name = name
+        self.capacity = capacity
+        self.queue_limit = queue_limit
+        self.per_user = per_user
+        self.semaphore = asyncio.Semaphore(capacity)
+        self.admitted = 0
+        self.per_user_admitted = {}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def admit(self, user_id=None) -> Ticket:
+        """Admit a request or raise 429 when the pool or the user is saturated"""
+        with self._lock:
+            if self.admitted >= self.capacity + self.queue_limit:
+                self.rejected += 1
+                raise _too_busy(f"Server is busy ({self.name}). Please retry shortly.")
+            if user_id is not None and self.per_user_admitted.get(user_id, 0) >= self.per_user:
+                self.rejected += 1
+                raise _too_busy("Too many concurrent requests. Please wait for the previous one to finish.")
+            self.admitted += 1
+            if user_id is not None:
+                self.per_user_admitted[user_id] = self.per_user_admitted.get(user_id, 0) + 1
+        return Ticket(self, user_id)
+
+    def leave(self, user_id=None):
+        with self._lock:
+            self.admitted -= 1
+            if user_id is not None:
+                remaining = self.per_user_admitted.get(user_id, 1) - 1
+                if remaining:
+                    self.per_user_admitted[user_id] = remaining
+                else:
+                    self.per_user_admitted.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "capacity": self.capacity,
+                "queue_limit": self.queue_limit,
+                "in_flight": min(self.admitted, self.capacity),
+                "queued": max(0, self.admitted - self.capacity),
+                "rejected": self.rejected,
+            }
+
+
+class ExecutionLayer:
+    def __init__(self):
+        self.cpu_pool = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+        self.tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
+        self.classes = {
+            "cpu": WorkClass("cpu", CPU_WORKERS, CPU_QUEUE_LIMIT, PER_USER_CONCURRENCY),
+            "llm": WorkClass("llm", LLM_CONCURRENCY, LLM_QUEUE_LIMIT, PER_USER_CONCURRENCY),
+        }
+
+    def configure(self):
+        """Called from the app lifespan inside the running event loop"""
+        import anyio.to_thread
+
+        loop = asyncio.get_running_loop()
+        # Sync tools and retrievers that LangChain pushes to the default
+        # executor get a bounded pool of their own, so a tool blocked on a
+        # render or sandbox call can't hold one of the few CPU threads
+        loop.set_default_executor(self.tool_pool)
+        anyio.to_thread.current_default_thread_limiter().total_tokens = CRUD_WORKERS
+
+    def admit(self, kind: str, user_id=None) -> Ticket:
+        return self.classes[kind].admit(user_id)
+
+    @asynccontextmanager
+    async def slot(self, kind: str, user_id=None):
+        """Admission control plus a concurrency slot for the enclosed work"""
+        ticket = self.admit(kind, user_id)
+        try:
+            await ticket.acquire()
+            yield
+        finally:
+            ticket.release()
+
+    async def run_cpu(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.cpu_pool, partial(fn, *args, **kwargs))
+
+    async def run_crud(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self.cpu_pool.shutdown(wait=False, cancel_futures=True)
+        self.tool_pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        stats = {name: work_class.stats() for name, work_class in self.classes.items()}
+        stats["tool"] = {"capacity": TOOL_WORKERS}
+        stats["crud"] = {"capacity": CRUD_WORKERS}
+        return stats
+
+
+execution = ExecutionLayer()
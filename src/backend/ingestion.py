@@ -0,0 +1,221 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlmodel import Session, select
+
+from .database import engine
+from .models import File
+from .vector_registry import vector_registry
+
+# Background vector indexing for PDF/TXT/EPUB uploads
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+# How long deleting a file waits for its running job to stop
+INGEST_CANCEL_WAIT_SECONDS = float(os.getenv("INGEST_CANCEL_WAIT_SECONDS", "60"))
+DOCUMENT_EXTENSIONS = (".pdf", ".txt", ".epub")
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+class IngestionJob:
+    def __init__(self, file_id: int, filepath: str):
+        self.file_id = file_id
+        self.filepath = filepath
+        self.status = STATUS_QUEUED
+        self.stage = None
+        self.done = 0
+        self.total = 0
+        self.error = None
+        self.stats = {}
+        self.rerun = False
+        self.cancelled = threading.Event()  # set when the file is deleted
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def report(self, stage: str, done: int = 0, total: int = 0):
+        self.stage = stage
+        self.done = done
+        self.total = total
+
+    def to_dict(self) -> dict:
+        return {
+            "file_id": self.file_id,
+            "status": self.status,
+            "stage": self.stage,
+            "done": self.done,
+            "total": self.total,
+            "progress": round(self.done / self.total, 3) if self.total else None,
+            "error": self.error,
+            "chunks": self.stats,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _set_status(file_id: int, status: str, error: str = None):
+    with Session(engine) as session:
+        file = session.get(File, file_id)
+        if file:
+            file.index_status = status
+            file.index_error = error
+            session.add(file)
+            session.commit()
+
+
+class IngestionQueue:
+    """
+    Runs RagPipeline ingestion on a small worker pool, one job per file at a
+    time, so chat requests never index inline or race on the same collection.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs = {}  # file_id -> IngestionJob (latest)
+        self._lock = threading.Lock()
+
+    def submit(self, file_id: int, filepath: str) -> IngestionJob:
+        with self._lock:
+            job = self._jobs.get(file_id)
+            if job and job.status == STATUS_QUEUED:
+                return job
+            if job and job.status == STATUS_RUNNING:
+                # The file changed under a running job; index it again afterwards
+                job.rerun = True
+                return job
+            job = IngestionJob(file_id, filepath)
+            self._jobs[file_id] = job
+        self._start(job)
+        return job
+
+    def _start(self, job: IngestionJob):
+        _set_status(job.file_id, STATUS_QUEUED)
+        self._executor.submit(self._run, job)
+
+    def _run(self, job: IngestionJob):
+        from .rag_pipeline import RagPipeline
+
+        with self._lock:
+            if job.cancelled.is_set():
+                return  # Deleted while queued; cancel() already finished it
+            job.status = STATUS_RUNNING
+            job.started_at = time.time()
+        _set_status(job.file_id, STATUS_RUNNING)
+        try:
+            pipeline = RagPipeline(job.filepath, str(job.file_id))
+            job.stats = pipeline.ingest(progress=job.report, cancel=job.cancelled)
+            self._finish(job, STATUS_DONE)
+        except Exception as e:
+            self._finish(job, STATUS_FAILED, str(e))
+
+    def _finish(self, job: IngestionJob, status: str, error: str = None):
+        if job.cancelled.is_set():
+            # The file was deleted: nothing to record, and whatever this job
+            # wrote after the delete gave up waiting for it is removed here
+            with self._lock:
+                job.status = STATUS_FAILED
+                job.error = "Cancelled"
+                job.finished_at = time.time()
+            vector_registry.remove(job.file_id)
+            job.finished.set()
+            return
+        # Saved on File first: once the job leaves _jobs, that is the record
+        _set_status(job.file_id, status, error[:500] if error else None)
+        # The status change and the rerun check are one step, so an upload
+        # that lands meanwhile either sees the finished job or gets its rerun
+        with self._lock:
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+            rerun = None
+            if self._jobs.get(job.file_id) is job:
+                if job.rerun:
+                    rerun = self._jobs[job.file_id] = IngestionJob(job.file_id, job.filepath)
+                else:
+                    del self._jobs[job.file_id]
+        job.finished.set()
+        if rerun is not None:
+            self._start(rerun)
+
+    def get(self, file_id: int):
+        with self._lock:
+            return self._jobs.get(file_id)
+
+    def ensure_indexed(self, file: File, timeout: float = None):
+        """
+        Make sure a document is (being) indexed and wait up to `timeout` for it.
+        Returns None once the index is ready, otherwise the unfinished or
+        failed job.
+        """
+        from .rag_pipeline import RagPipeline
+
+        job = self.get(file.id)
+        if job is None:
+            # Finished jobs are dropped; their outcome is on the File row
+            # (re-read, as `file` may predate the job finishing)
+            with Session(engine) as session:
+                current = session.get(File, file.id)
+                status, error = (current.index_status, current.index_error) if current else (None, None)
+            if status == STATUS_FAILED:
+                failed = IngestionJob(file.id, file.filepath)
+                failed.status, failed.error = STATUS_FAILED, error
+                failed.finished.set()
+                return failed
+            # Indexes built before job tracking have no status but exist on disk
+            ready = RagPipeline(file.filepath, str(file.id)).is_indexed()
+            if ready and status in (None, STATUS_DONE):
+                return None
+            job = self.submit(file.id, file.filepath)
+        elif job.status == STATUS_DONE:
+            return None
+
+        job.finished.wait(timeout)
+        return None if job.status == STATUS_DONE else job
+
+    def cancel(self, file_id: int, timeout: float = INGEST_CANCEL_WAIT_SECONDS) -> bool:
+        """
+        Stop a deleted file's job and wait for it to finish; returns False if
+        it was still running at the timeout (it then cleans up after itself)
+        """
+        with self._lock:
+            job = self._jobs.pop(file_id, None)
+            if job is None:
+                return True
+            job.rerun = False
+            job.cancelled.set()
+            if job.status == STATUS_QUEUED:
+                # Not started, so nothing was written; _run will skip it
+                job.status, job.error = STATUS_FAILED, "Cancelled"
+                job.finished.set()
+                return True
+        return job.finished.wait(timeout)
+
+    def resume_pending(self):
+        """Re-queue jobs that were queued or running when the process stopped"""
+        with Session(engine) as session:
+            statement = select(File).where(File.index_status.in_([STATUS_QUEUED, STATUS_RUNNING]))
+            pending = [(f.id, f.filepath) for f in session.exec(statement).all()]
+        for file_id, filepath in pending:
+            if os.path.exists(filepath):
+                self.submit(file_id, filepath)
+            else:
+                _set_status(file_id, STATUS_FAILED, "File not found on disk")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {"workers": self._executor._max_workers, "jobs": counts}
+
+
+ingestion_queue = IngestionQueue(INGEST_WORKERS)
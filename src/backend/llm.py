@@ -0,0 +1,463 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, List, Optional
+
+import httpx
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import Generation, LLMResult
+
+# Text-generation client for the Hugging Face Inference API or any
+# TGI-compatible server (point LLM_ENDPOINT at a local server to test)
+LLM_MODEL = os.getenv("LLM_MODEL", "google/flan-t5-xxl")
+LLM_ENDPOINT = os.getenv("LLM_ENDPOINT") or f"https://router.huggingface.co/hf-inference/models/{LLM_MODEL}"
+LLM_MAX_NEW_TOKENS = int(os.getenv("LLM_MAX_NEW_TOKENS", "256"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "20"))
+# Send several prompts in one request when the backend accepts list inputs
+LLM_BATCH_INPUTS = os.getenv("LLM_BATCH_INPUTS", "false").lower() in ("1", "true", "yes")
+
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    pass
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def _generated_text(item) -> str:
+    if isinstance(item, list):
+        item = item[0] if item else {}
+    return item.get("generated_text", "") if isinstance(item, dict) else str(item)
+
+
+def _generated_tokens(item, text: str) -> int:
+    if isinstance(item, list):
+        item = item[0] if item else {}
+    details = item.get("details") if isinstance(item, dict) else None
+    if details and details.get("generated_tokens") is not None:
+        return details["generated_tokens"]
+    return _estimate_tokens(text)
+
+
+def _stream_token(line: str) -> Optional[str]:
+    """Token text from one TGI server-sent event line"""
+    if not line.startswith("data:"):
+        return None
+    payload = json.loads(line[len("data:"):].strip())
+    if "error" in payload:
+        raise LLMError(payload["error"])
+    token = payload.get("token") or {}
+    if token.get("special"):
+        return None
+    return token.get("text")
+
+
+class ConcurrencyLimit:
+    """
+    One cap on in-flight calls shared by threads and event loops. Waiters are
+    served in arrival order; a released slot is handed straight to the next.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()  # threading.Event or asyncio.Future per waiter
+
+    def _try_acquire(self, waiter) -> bool:
+        with self._lock:
+            if self._active < self.limit and not self._waiters:
+                self._active += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self):
+        event = threading.Event()
+        if not self._try_acquire(event):
+            event.wait()
+
+    async def acquire_async(self):
+        future = asyncio.get_running_loop().create_future()
+        if self._try_acquire(future):
+            return
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+                    raise
+            # Granted just before the cancel landed; a grant still in flight
+            # sees the cancelled future and releases the slot itself
+            if not future.cancelled():
+                self.release()
+            raise
+
+    def _grant(self, future):
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._active -= 1
+                    return
+                waiter = self._waiters.popleft()
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+                return
+            try:
+                waiter.get_loop().call_soon_threadsafe(self._grant, waiter)
+                return
+            except RuntimeError:
+                continue  # Its event loop is closed; pass the slot on
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return self._active
+
+
+class InferenceClient:
+    """
+    Pooled, retrying HTTP client shared by every LLM call in the process.
+
+    One httpx client per mode keeps connections alive across requests; one
+    limit, shared by sync and async calls, caps in-flight calls to the
+    endpoint, and failures are retried with full-jitter exponential backoff.
+    """
+
+    def __init__(self, endpoint: str, token: str = ""):
+        self.endpoint = endpoint
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self.timeout = httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS)
+        self.limits = httpx.Limits(
+            max_connections=LLM_POOL_CONNECTIONS, max_keepalive_connections=LLM_POOL_CONNECTIONS
+        )
+        self._client = None
+        self._async_clients = {}  # event loop -> AsyncClient
+        self._limit = ConcurrencyLimit(LLM_MAX_CONCURRENCY)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+
+    # -- clients -----------------------------------------------------------
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(headers=self.headers, timeout=self.timeout, limits=self.limits)
+            return self._client
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for stale in [l for l in self._async_clients if l.is_closed()]:
+                del self._async_clients[stale]
+            if loop not in self._async_clients:
+                self._async_clients[loop] = httpx.AsyncClient(
+                    headers=self.headers, timeout=self.timeout, limits=self.limits
+                )
+            return self._async_clients[loop]
+
+    def _payload(self, inputs, max_new_tokens: int, stop: Optional[List[str]], stream: bool = False):
+        parameters = {
+            "max_new_tokens": max_new_tokens,
+            "return_full_text": False,
+            "details": True,
+        }
+        if stop:
+            parameters["stop"] = stop
+        payload = {"inputs": inputs, "parameters": parameters}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    # -- bookkeeping -------------------------------------------------------
+
+    def _record(self, started: float, prompts: List[str], generated_tokens: int):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.calls += 1
+            self.latency_total += elapsed
+            self.latency_max = max(self.latency_max, elapsed)
+            self.prompt_tokens += sum(_estimate_tokens(p) for p in prompts)
+            self.generated_tokens += generated_tokens
+
+    def _record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def _backoff(self, attempt: int) -> float:
+        with self._lock:
+            self.retries += 1
+        return random.uniform(0, LLM_RETRY_BASE_SECONDS * (2 ** attempt))
+
+    @staticmethod
+    def _retryable(error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code in RETRY_STATUS_CODES
+        return isinstance(error, httpx.TransportError)
+
+    # -- sync API ----------------------------------------------------------
+
+    def _post(self, payload: dict):
+        client = self._sync_client()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                response = client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not self._retryable(e):
+                    raise
+                time.sleep(self._backoff(attempt))
+
+    def generate(self, prompt: str, stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS) -> str:
+        started = time.perf_counter()
+        with self._limit:
+            try:
+                result = self._post(self._payload(prompt, max_new_tokens, stop))
+            except Exception:
+                self._record_error()
+                raise
+        text = _generated_text(result)
+        self._record(started, [prompt], _generated_tokens(result, text))
+        return text
+
+    def generate_batch(self, prompts: List[str], stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS) -> List[str]:
+        """One request for all prompts if the backend takes list inputs, else one per prompt"""
+        if not LLM_BATCH_INPUTS or len(prompts) == 1:
+            return [self.generate(p, stop, max_new_tokens) for p in prompts]
+        started = time.perf_counter()
+        with self._limit:
+            try:
+                results = self._post(self._payload(prompts, max_new_tokens, stop))
+            except Exception:
+                self._record_error()
+                raise
+        texts = [_generated_text(item) for item in results]
+        tokens = sum(_generated_tokens(item, text) for item, text in zip(results, texts))
+        self._record(started, prompts, tokens)
+        return texts
+
+    def stream(self, prompt: str, stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS):
+        """Yield generated tokens as the server produces them"""
+        started = time.perf_counter()
+        client = self._sync_client()
+        generated = 0
+        with self._limit:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                try:
+                    payload = self._payload(prompt, max_new_tokens, stop, stream=True)
+                    with client.stream("POST", self.endpoint, json=payload) as response:
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            token = _stream_token(line)
+                            if token:
+                                generated += 1
+                                yield token
+                    break
+                except Exception as e:
+                    # Only retry if nothing has been emitted yet
+                    if generated or attempt >= LLM_MAX_RETRIES or not self._retryable(e):
+                        self._record_error()
+                        raise
+                    time.sleep(self._backoff(attempt))
+        self._record(started, [prompt], generated)
+
+    # -- async API ---------------------------------------------------------
+
+    async def _apost(self, client: httpx.AsyncClient, payload: dict):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            try:
+                response = await client.post(self.endpoint, json=payload)
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not self._retryable(e):
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+
+    async def agenerate(self, prompt: str, stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS) -> str:
+        client = self._async_client()
+        started = time.perf_counter()
+        async with self._limit:
+            try:
+                result = await self._apost(client, self._payload(prompt, max_new_tokens, stop))
+            except Exception:
+                self._record_error()
+                raise
+        text = _generated_text(result)
+        self._record(started, [prompt], _generated_tokens(result, text))
+        return text
+
+    async def agenerate_batch(self, prompts: List[str], stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS) -> List[str]:
+        if not LLM_BATCH_INPUTS or len(prompts) == 1:
+            return list(await asyncio.gather(*(self.agenerate(p, stop, max_new_tokens) for p in prompts)))
+        client = self._async_client()
+        started = time.perf_counter()
+        async with self._limit:
+            try:
+                results = await self._apost(client, self._payload(prompts, max_new_tokens, stop))
+            except Exception:
+                self._record_error()
+                raise
+        texts = [_generated_text(item) for item in results]
+        tokens = sum(_generated_tokens(item, text) for item, text in zip(results, texts))
+        self._record(started, prompts, tokens)
+        return texts
+
+    async def astream(self, prompt: str, stop=None, max_new_tokens: int = LLM_MAX_NEW_TOKENS):
+        client = self._async_client()
+        started = time.perf_counter()
+        generated = 0
+        async with self._limit:
+            for attempt in range(LLM_MAX_RETRIES + 1):
+                try:
+                    payload = self._payload(prompt, max_new_tokens, stop, stream=True)
+                    async with client.stream("POST", self.endpoint, json=payload) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            token = _stream_token(line)
+                            if token:
+                                generated += 1
+                                yield token
+                    break
+                except Exception as e:
+                    if generated or attempt >= LLM_MAX_RETRIES or not self._retryable(e):
+                        self._record_error()
+                        raise
+                    await asyncio.sleep(self._backoff(attempt))
+        self._record(started, [prompt], generated)
+
+    async def aclose(self):
+        """Close the sync client and every event loop's async client"""
+        with self._lock:
+            client, self._client = self._client, None
+            async_clients, self._async_clients = self._async_clients, {}
+        if client is not None:
+            client.close()
+        current = asyncio.get_running_loop()
+        for loop, async_client in async_clients.items():
+            if loop is current:
+                await async_client.aclose()
+            elif loop.is_running():
+                future = asyncio.run_coroutine_threadsafe(async_client.aclose(), loop)
+                await asyncio.wrap_future(future)
+            # A closed loop's connections went with it
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "endpoint": self.endpoint,
+                "max_concurrency": LLM_MAX_CONCURRENCY,
+                "in_flight": self._limit.in_flight(),
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency_avg": self.latency_total / self.calls if self.calls else 0.0,
+                "latency_max": self.latency_max,
+                "prompt_tokens": self.prompt_tokens,
+                "generated_tokens": self.generated_tokens,
+            }
+
+
+inference_client = InferenceClient(LLM_ENDPOINT, os.getenv("HF_TOKEN") or "")
+
+
+class HuggingFaceLLM(LLM):
+    """LangChain LLM backed by the shared inference client"""
+
+    # Report tokens to callbacks as they are generated
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "huggingface"
+
+    @staticmethod
+    def _error(error: Exception) -> LLMError:
+        # Raised, never returned as text, so a failed call can't pass for an
+        # answer (and be cached as one)
+        if isinstance(error, LLMError):
+            return error
+        return LLMError(f"LLM request failed: {str(error)}")
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        try:
+            if self.streaming:
+                text = ""
+                for token in inference_client.stream(prompt, stop):
+                    text += token
+                    if run_manager:
+                        run_manager.on_llm_new_token(token)
+                return text
+            return inference_client.generate(prompt, stop)
+        except Exception as e:
+            raise self._error(e) from e
+
+    async def _acall(self, prompt: str, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> str:
+        try:
+            if self.streaming:
+                text = ""
+                async for token in inference_client.astream(prompt, stop):
+                    text += token
+                    if run_manager:
+                        await run_manager.on_llm_new_token(token)
+                return text
+            return await inference_client.agenerate(prompt, stop)
+        except Exception as e:
+            raise self._error(e) from e
+
+    def _generate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        if self.streaming or len(prompts) == 1:
+            return super()._generate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        try:
+            texts = inference_client.generate_batch(prompts, stop)
+        except Exception as e:
+            raise self._error(e) from e
+        return LLMResult(generations=[[Generation(text=t)] for t in texts])
+
+    async def _agenerate(self, prompts: List[str], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> LLMResult:
+        if self.streaming or len(prompts) == 1:
+            return await super()._agenerate(prompts, stop=stop, run_manager=run_manager, **kwargs)
+        try:
+            texts = await inference_client.agenerate_batch(prompts, stop)
+        except Exception as e:
+            raise self._error(e) from e
+        return LLMResult(generations=[[Generation(text=t)] for t in texts])
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -10,14 +11,54 @@ load_dotenv()
 
 from .database import create_db_and_tables
 from .routers import auth, files, chat
+from .data_cache import dataframe_cache
+from .rendering import chart_renderer
+from .plot_cache import plot_cache
+from .embeddings import PRELOAD_EMBEDDINGS, embedding_service
+from .embedding_cache import embedding_cache
+from .ingestion import ingestion_queue
+from .execution import execution
+from .response_cache import response_cache
+from .llm import inference_client
+from .query_engine import query_engine
+from .agent_factory import agent_stats
+from .sandbox import ALLOW_UNSANDBOXED_CODE, SANDBOX_ENABLED, sandbox_pool
+from .retrieval import retrieval_stats
+from .vector_registry import vector_registry
+from .conversation import conversation_memory
+from .pagination import NEXT_CURSOR_HEADER
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    execution.configure()
     create_db_and_tables()
     # Ensure static directories exist
     os.makedirs("uploads", exist_ok=True)
     os.makedirs("static/plots", exist_ok=True)
+    chart_renderer.start()
+    plot_cache.start_janitor()
+    if SANDBOX_ENABLED:
+        sandbox_pool.start()
+    elif ALLOW_UNSANDBOXED_CODE:
+        print("WARNING: SANDBOX_ENABLED=false; agent-written code runs unsandboxed in the API process")
+    else:
+        print("WARNING: SANDBOX_ENABLED=false; the data agent is off (set ALLOW_UNSANDBOXED_CODE=true to run it in-process)")
+    if PRELOAD_EMBEDDINGS:
+        # Load the embedding model before serving so RAG requests never pay for it
+        try:
+            await asyncio.to_thread(embedding_service.load)
+        except Exception as e:
+            print(f"Embedding model preload failed: {str(e)}")
+    ingestion_queue.resume_pending()
     yield
+    ingestion_queue.shutdown()
+    conversation_memory.shutdown()
+    plot_cache.stop_janitor()
+    chart_renderer.shutdown()
+    sandbox_pool.shutdown()
+    execution.shutdown()
+    await inference_client.aclose()
+    vector_registry.clear()
 
 app = FastAPI(
     lifespan=lifespan, 
@@ -41,6 +82,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read the next-page cursor of list endpoints
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -65,3 +108,25 @@ def read_root():
             "🔐 Secure Authentication"
         ]
     }
+
+
+@app.get("/metrics")
+def read_metrics():
+    """Runtime counters for the in-process caches"""
+    return {
+        "dataframe_cache": dataframe_cache.stats(),
+        "chart_renderer": chart_renderer.stats(),
+        "plot_cache": plot_cache.stats(),
+        "embeddings": embedding_service.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "ingestion": ingestion_queue.stats(),
+        "execution": execution.stats(),
+        "response_cache": response_cache.stats(),
+        "llm": inference_client.stats(),
+        "query_engine": query_engine.stats(),
+        "agent": agent_stats.stats(),
+        "sandbox": sandbox_pool.stats(),
+        "retrieval": retrieval_stats.stats(),
+        "vector_registry": vector_registry.stats(),
+        "memory": conversation_memory.stats(),
+    }
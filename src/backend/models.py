@@ -1,5 +1,6 @@
 from datetime import datetime
 from typing import Optional, List
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 
 class User(SQLModel, table=True):
@@ -16,8 +17,12 @@ class File(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     filename: str
     filepath: str
+    sidecar_path: Optional[str] = Field(default=None)
+    content_hash: Optional[str] = Field(default=None)
+    index_status: Optional[str] = Field(default=None) # queued/running/done/failed for documents
+    index_error: Optional[str] = Field(default=None)
     upload_date: datetime = Field(default_factory=datetime.utcnow)
-    owner_id: int = Field(foreign_key="user.id")
+    owner_id: int = Field(foreign_key="user.id", index=True)
 
     owner: User = Relationship(back_populates="files")
     chat_sessions: List["ChatSession"] = Relationship(back_populates="file")
@@ -26,14 +31,21 @@ class ChatSession(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str = Field(default="New Chat")
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    user_id: int = Field(foreign_key="user.id")
-    file_id: Optional[int] = Field(default=None, foreign_key="file.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
+    file_id: Optional[int] = Field(default=None, foreign_key="file.id", index=True)
+    # Rolling summary of the messages up to summary_message_id, which have
+    # left the conversational memory window
+    summary: Optional[str] = Field(default=None)
+    summary_message_id: Optional[int] = Field(default=None)
 
     user: User = Relationship(back_populates="chats")
     file: Optional[File] = Relationship(back_populates="chat_sessions")
     messages: List["Message"] = Relationship(back_populates="session")
 
 class Message(SQLModel, table=True):
+    # History is always read per session in time order
+    __table_args__ = (Index("ix_message_session_id_timestamp", "session_id", "timestamp"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     content: str
     role: str # "user" or "assistant"
@@ -0,0 +1,204 @@
+import os
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .columnar import CHUNK_ROWS, estimate_rows, fresh_sidecar, iter_table_chunks, parse_text_table
+
+# Large CSVs are never held in memory whole. Statistics are built from
+# mergeable partial aggregates (sum/count/min/max/sum of squares, value
+# counts, per-group partials) accumulated one chunk at a time, and the agent
+# works on a bounded sample of the rows.
+AGENT_SAMPLE_ROWS = int(os.getenv("AGENT_SAMPLE_ROWS", "100000"))
+# Distinct values tracked per column / groups per aggregate before giving up
+VALUE_COUNTS_MAX_KEYS = int(os.getenv("VALUE_COUNTS_MAX_KEYS", "100000"))
+
+MERGEABLE_AGGREGATES = ("sum", "count", "min", "max", "mean", "std")
+_PARTIAL_COMBINE = {"sum": "sum", "count": "sum", "min": "min", "max": "max", "sumsq": "sum"}
+
+
+class TooManyGroups(Exception):
+    pass
+
+
+def _numeric_columns(chunk: pd.DataFrame) -> List[str]:
+    return [
+        c for c in chunk.columns
+        if pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])
+    ]
+
+
+def numeric_partials(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Per-column sum/count/min/max/sumsq of a chunk's numeric columns"""
+    numeric = chunk[_numeric_columns(chunk)].astype("float64")
+    partial = numeric.agg(["sum", "count", "min", "max"])
+    partial.loc["sumsq"] = (numeric * numeric).sum()
+    return partial
+
+
+def merge_numeric(a: Optional[pd.DataFrame], b: pd.DataFrame) -> pd.DataFrame:
+    if a is None:
+        return b
+    return pd.DataFrame({
+        "sum": a.loc["sum"].add(b.loc["sum"], fill_value=0),
+        "count": a.loc["count"].add(b.loc["count"], fill_value=0),
+        "min": pd.concat([a.loc["min"], b.loc["min"]], axis=1).min(axis=1),
+        "max": pd.concat([a.loc["max"], b.loc["max"]], axis=1).max(axis=1),
+        "sumsq": a.loc["sumsq"].add(b.loc["sumsq"], fill_value=0),
+    }).T
+
+
+def finalize(partial, agg: str):
+    """Turn merged partials (a Series or a per-group frame) into one aggregate"""
+    count = partial["count"]
+    if agg in ("sum", "count", "min", "max"):
+        return partial[agg]
+    mean = partial["sum"] / count
+    if agg == "mean":
+        return mean
+    # Sample standard deviation from the sum of squares
+    variance = (partial["sumsq"] - count * mean * mean) / (count - 1)
+    return np.sqrt(np.maximum(variance, 0))
+
+
+def merge_counts(a: Optional[pd.Series], b: pd.Series, max_keys: int = VALUE_COUNTS_MAX_KEYS):
+    """Add value counts; returns (counts, exact) and prunes to max_keys if needed"""
+    merged = b if a is None else a.add(b, fill_value=0)
+    if len(merged) > max_keys:
+        return merged.nlargest(max_keys), False
+    return merged, True
+
+
+def count_rows(filepath: str) -> int:
+    """Exact row count: the sidecar's Parquet metadata, else a one-column scan"""
+    sidecar = fresh_sidecar(filepath)
+    if sidecar:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(sidecar).metadata.num_rows
+    if not filepath.endswith(".csv"):
+        return len(parse_text_table(filepath).index)
+    rows = 0
+    # Only the first column is converted; the rest of each line is just skipped over
+    for chunk in pd.read_csv(filepath, usecols=[0], dtype=str, chunksize=CHUNK_ROWS):
+        rows += len(chunk)
+    return rows
+
+
+def value_counts(filepath: str, column: str) -> pd.Series:
+    """Exact value counts, largest first; raises TooManyGroups past the key limit"""
+    counts = None
+    for chunk in iter_table_chunks(filepath, columns=[column]):
+        counts, exact = merge_counts(counts, chunk[column].value_counts())
+        if not exact:
+            raise TooManyGroups(column)
+    if counts is None:
+        return pd.Series(dtype="float64")
+    counts = counts.astype("int64").sort_values(ascending=False)
+    counts.index.name = column
+    return counts
+
+
+def nunique(filepath: str, column: str) -> int:
+    return len(value_counts(filepath, column))
+
+
+def aggregate(filepath: str, column: str, agg: str, group: Optional[str] = None):
+    """
+    sum/count/min/max/mean/std of a column, optionally per group, in one
+    streaming pass. Returns None for aggregates that can't be merged (median).
+    """
+    if agg not in MERGEABLE_AGGREGATES:
+        return None
+    columns = [column] if group is None else [group, column]
+    merged = None
+    for chunk in iter_table_chunks(filepath, columns=columns):
+        values = chunk[column].astype("float64")
+        if group is None:
+            partial = pd.DataFrame({
+                "sum": [values.sum()], "count": [values.count()],
+                "min": [values.min()], "max": [values.max()], "sumsq": [(values * values).sum()],
+            })
+        else:
+            grouped = values.groupby(chunk[group], observed=True)
+            partial = pd.DataFrame({
+                "sum": grouped.sum(), "count": grouped.count(),
+                "min": grouped.min(), "max": grouped.max(),
+                "sumsq": (values * values).groupby(chunk[group], observed=True).sum(),
+            })
+        merged = partial if merged is None else pd.concat([merged, partial]).groupby(level=0).agg(_PARTIAL_COMBINE)
+        if len(merged) > VALUE_COUNTS_MAX_KEYS:
+            raise TooManyGroups(group)
+    if merged is None:
+        return None
+    if group is None:
+        return finalize(merged.iloc[0], agg)
+    result = finalize(merged, agg)
+    result.index.name = group
+    return result
+
+
+def sample_table(filepath: str, rows: int = AGENT_SAMPLE_ROWS) -> pd.DataFrame:
+    """Evenly spaced sample of about `rows` rows, taken in one streaming pass"""
+    stride = max(1, (estimate_rows(filepath) or rows) // rows)
+    parts = []
+    seen = taken = 0
+    for chunk in iter_table_chunks(filepath):
+        # Keep the stride aligned across chunk boundaries
+        part = chunk.iloc[(-seen) % stride::stride]
+        parts.append(part)
+        seen += len(chunk)
+        taken += len(part)
+        if taken >= rows:
+            break
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat(parts, ignore_index=True).head(rows)
+
+
+def scan_profile(filepath: str, line_points: int, categorical_dtypes, unique_cap: int = VALUE_COUNTS_MAX_KEYS) -> dict:
+    """
+    One pass over a large table collecting everything the dataset profile
+    needs: row count, dtypes, null counts, numeric partials, value counts of
+    the categorical columns (capped at unique_cap per column), sums of the
+    first numeric column per value of the first text column, and the first
+    rows for trend charts. Numeric columns are described by their partials
+    alone; tallying their values would keep up to unique_cap keys each.
+    """
+    rows = 0
+    dtypes = nulls = numeric = head = group_sums = None
+    group_by = None
+    counts = {}
+    exact = {}
+    for chunk in iter_table_chunks(filepath):
+        rows += len(chunk)
+        if dtypes is None:
+            dtypes = chunk.dtypes
+            head = chunk.head(line_points)
+            categorical = chunk.select_dtypes(include=categorical_dtypes).columns
+            numeric_cols = _numeric_columns(chunk)
+            if len(categorical) and numeric_cols:
+                group_by = (categorical[0], numeric_cols[0])
+        chunk_nulls = chunk.isna().sum()
+        nulls = chunk_nulls if nulls is None else nulls.add(chunk_nulls, fill_value=0)
+        numeric = merge_numeric(numeric, numeric_partials(chunk))
+        for col in categorical:
+            if exact.get(col, True):
+                counts[col], exact[col] = merge_counts(counts.get(col), chunk[col].value_counts(), unique_cap)
+        if group_by is not None:
+            cat_col, num_col = group_by
+            sums = chunk[num_col].astype("float64").groupby(chunk[cat_col], observed=True).sum()
+            group_sums, exact_groups = merge_counts(group_sums, sums, unique_cap)
+            if not exact_groups:
+                group_by = group_sums = None
+    return {
+        "rows": rows,
+        "dtypes": dtypes if dtypes is not None else pd.Series(dtype=object),
+        "nulls": nulls,
+        "numeric": numeric,
+        "value_counts": counts,
+        "exact_counts": exact,
+        "group_by": group_by,
+        "group_sums": group_sums,
+        "head": head if head is not None else pd.DataFrame(),
+    }
@@ -0,0 +1,31 @@
+import os
+from typing import Optional
+
+from fastapi import Response
+
+# Keyset pagination for list endpoints: a page is the newest `limit` rows
+# (older than the `before` id, if given), returned oldest first. When older
+# rows remain, the id to pass as `before` for the next page is sent in the
+# X-Next-Cursor header, so the body stays a plain list.
+# Without ?limit= everything is returned: the Streamlit frontend doesn't
+# follow the cursor yet. Set PAGE_SIZE_DEFAULT once it does.
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "0")) or None
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def page_limit(statement, limit: Optional[int]):
+    """Fetch one row past the page, so keyset_page can tell whether more remain"""
+    return statement if limit is None else statement.limit(limit + 1)
+
+
+def keyset_page(rows, limit: Optional[int], response: Response) -> list:
+    """
+    Turn up to limit + 1 rows fetched newest first into a page, setting the
+    next-page cursor when the extra row shows there is more
+    """
+    page = list(rows[:limit])
+    if limit is not None and len(rows) > limit and page:
+        response.headers[NEXT_CURSOR_HEADER] = str(page[-1].id)
+    page.reverse()
+    return page
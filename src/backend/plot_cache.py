@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .rendering import STATIC_DIR, chart_renderer
+
+# Content-addressed chart images: the file name is a hash of the data the
+# chart was drawn from plus its spec, so identical charts are rendered once
+PLOT_CACHE_MAX_MB = int(os.getenv("PLOT_CACHE_MAX_MB", "512"))
+PLOT_CACHE_MAX_AGE_HOURS = float(os.getenv("PLOT_CACHE_MAX_AGE_HOURS", "168"))
+PLOT_CACHE_JANITOR_SECONDS = int(os.getenv("PLOT_CACHE_JANITOR_SECONDS", "600"))
+
+# Bump when rendering output changes (dpi, palettes, fonts) to retire old images
+PLOT_STYLE_VERSION = 1
+
+
+def chart_key(content_hash: str, spec: dict) -> str:
+    payload = json.dumps(
+        {"content": content_hash, "spec": spec, "style": PLOT_STYLE_VERSION},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def plot_url(plot_name: str) -> str:
+    """Public URL of a chart image, served (once rendered) by GET /chat/plots/{name}"""
+    return f"http://localhost:8000/chat/plots/{plot_name}"
+
+
+class PlotCache:
+    def __init__(self, directory: str, max_bytes: int, max_age_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, content_hash: str, spec: dict, render=None) -> str:
+        """
+        Return the plot file name for a chart, rendering it only when no image
+        with the same content hash and spec exists yet.
+        """
+        name = f"{chart_key(content_hash, spec)}.png"
+        path = os.path.join(self.directory, name)
+        if os.path.exists(path):
+            # Touch so the janitor treats mtime as last access
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            with self._lock:
+                self.hits += 1
+            return name
+
+        with self._lock:
+            self.misses += 1
+        if render is not None:
+            return render(name)
+        return chart_renderer.submit(spec, name)
+
+    def sweep(self):
+        """Delete images past their max age, then the least recently used over budget"""
+        now = time.time()
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith(".png"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path, name))
+
+        evicted = 0
+        total = 0
+        survivors = []
+        for mtime, size, path, name in entries:
+            if now - mtime > self.max_age_seconds and not chart_renderer.is_pending(name):
+                evicted += self._remove(path)
+            else:
+                total += size
+                survivors.append((mtime, size, path, name))
+
+        survivors.sort()
+        for mtime, size, path, name in survivors:
+            if total <= self.max_bytes:
+                break
+            if chart_renderer.is_pending(name):
+                continue
+            if self._remove(path):
+                evicted += 1
+                total -= size
+
+        with self._lock:
+            self.evictions += evicted
+
+    @staticmethod
+    def _remove(path) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError:
+            return 0
+
+    def _run_janitor(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Plot cache sweep failed: {str(e)}")
+
+    def start_janitor(self, interval: float = PLOT_CACHE_JANITOR_SECONDS):
+        if self._janitor is not None:
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(
+            target=self._run_janitor, args=(interval,), name="plot-cache-janitor", daemon=True
+        )
+        self._janitor.start()
+
+    def stop_janitor(self):
+        self._stop.set()
+        self._janitor = None
+
+    def stats(self) -> dict:
+        files = 0
+        size = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".png"):
+                        files += 1
+                        size += entry.stat().st_size
+        except OSError:
+            pass
+        with self._lock:
+            return {
+                "files": files,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+plot_cache = PlotCache(
+    STATIC_DIR,
+    max_bytes=PLOT_CACHE_MAX_MB * 1024 * 1024,
+    max_age_seconds=PLOT_CACHE_MAX_AGE_HOURS * 3600,
+)
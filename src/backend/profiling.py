@@ -0,0 +1,344 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from .columnar import is_large_table
+from .data_cache import read_table
+from .dtypes import optimize_dtypes
+from .out_of_core import scan_profile
+
+# Persisted dataset profiles, one JSON document per file content hash
+PROFILE_DIR = "profiles"
+os.makedirs(PROFILE_DIR, exist_ok=True)
+
+# Bump when the profile layout changes so old documents are rebuilt
+PROFILE_VERSION = 3
+
+TOP_K = 10
+BAR_MAX_CATEGORIES = 20
+PIE_MAX_CATEGORIES = 10
+LINE_POINTS = 50
+SCHEMA_SAMPLES = 3
+# Columns listed in the agent's schema digest
+DIGEST_MAX_COLUMNS = 60
+
+CATEGORICAL_DTYPES = ["object", "string", "category"]
+
+# Recently used profiles and file hashes kept in memory; profiles are also
+# on disk, so an evicted one costs a JSON read
+PROFILE_MEMORY_ENTRIES = int(os.getenv("PROFILE_MEMORY_ENTRIES", "64"))
+HASH_MEMO_ENTRIES = 1024
+
+_memory_profiles = OrderedDict()
+_hash_memo = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember(cache: OrderedDict, key, value, max_entries: int):
+    """Insert into an LRU dict, evicting the oldest entries; call under _lock"""
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > max_entries:
+        cache.popitem(last=False)
+
+
+def _scalar(value):
+    """Convert numpy/pandas scalars into JSON-safe Python values"""
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, (int, float, bool, str)):
+        return value
+    return str(value)
+
+
+def hash_file(filepath: str) -> str:
+    """sha256 of the file contents, memoized on size/mtime"""
+    st = os.stat(filepath)
+    memo_key = (filepath, st.st_size, st.st_mtime_ns)
+    with _lock:
+        if memo_key in _hash_memo:
+            _hash_memo.move_to_end(memo_key)
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    content_hash = digest.hexdigest()
+
+    with _lock:
+        _remember(_hash_memo, memo_key, content_hash, HASH_MEMO_ENTRIES)
+    return content_hash
+
+
+def profile_dataframe(df: pd.DataFrame) -> dict:
+    """
+    Compute every summary the dashboard needs in one pass over the frame:
+    numeric aggregates, categorical cardinality/top values and the small
+    series the default charts are drawn from.
+    """
+    numeric = df.select_dtypes(include=["number"])
+    categorical = df.select_dtypes(include=CATEGORICAL_DTYPES)
+    numeric_cols = numeric.columns.tolist()
+    categorical_cols = categorical.columns.tolist()
+
+    numeric_stats = {}
+    if numeric_cols:
+        summary = numeric.agg(["sum", "mean", "min", "max", "count"])
+        for col in numeric_cols:
+            numeric_stats[str(col)] = {
+                stat: _scalar(summary.at[stat, col]) for stat in summary.index
+            }
+
+    categorical_stats = {}
+    if categorical_cols:
+        cardinality = categorical.nunique()
+        for col in categorical_cols:
+            top = categorical[col].value_counts().head(TOP_K)
+            categorical_stats[str(col)] = {
+                "unique": int(cardinality[col]),
+                "top": [[_scalar(k), int(v)] for k, v in top.items()],
+            }
+
+    charts = {"bar": None, "pie": None, "line": None}
+    if categorical_cols and numeric_cols:
+        cat_col, num_col = categorical_cols[0], numeric_cols[0]
+        if categorical_stats[str(cat_col)]["unique"] <= BAR_MAX_CATEGORIES:
+            grouped = df.groupby(cat_col, observed=True)[num_col].sum()
+            grouped = grouped.sort_values(ascending=False).head(10)
+            charts["bar"] = {
+                "x": str(cat_col),
+                "y": str(num_col),
+                "labels": [_scalar(k) for k in grouped.index],
+                "values": [_scalar(v) for v in grouped.values],
+            }
+    if categorical_cols:
+        cat_col = str(categorical_cols[0])
+        if categorical_stats[cat_col]["unique"] <= PIE_MAX_CATEGORIES:
+            top = categorical_stats[cat_col]["top"][:8]
+            charts["pie"] = {
+                "column": cat_col,
+                "labels": [k for k, _ in top],
+                "values": [v for _, v in top],
+            }
+    if numeric_cols:
+        head = numeric[numeric_cols[:3]].head(LINE_POINTS)
+        charts["line"] = {
+            "series": {str(col): [_scalar(v) for v in head[col].values] for col in head.columns}
+        }
+
+    # Per-column schema for the agent prompt
+    nulls = df.isna().sum()
+    unique = df.nunique()
+    schema = []
+    for col in df.columns:
+        entry = {
+            "name": str(col),
+            "dtype": str(df[col].dtype),
+            "nulls": int(nulls[col]),
+            "unique": int(unique[col]),
+        }
+        if str(col) in numeric_stats or pd.api.types.is_datetime64_any_dtype(df[col]):
+            stats = numeric_stats.get(str(col)) or {"min": _scalar(df[col].min()), "max": _scalar(df[col].max())}
+            entry["min"], entry["max"] = stats["min"], stats["max"]
+        elif str(col) in categorical_stats:
+            entry["samples"] = [k for k, _ in categorical_stats[str(col)]["top"][:SCHEMA_SAMPLES]]
+        schema.append(entry)
+
+    return {
+        "version": PROFILE_VERSION,
+        "rows": int(len(df)),
+        "columns": int(len(df.columns)),
+        "numeric_cols": [str(c) for c in numeric_cols],
+        "categorical_cols": [str(c) for c in categorical_cols],
+        "numeric": numeric_stats,
+        "categorical": categorical_stats,
+        "charts": charts,
+        "schema": schema,
+    }
+
+
+def profile_large_table(filepath: str) -> dict:
+    """
+    Same profile as profile_dataframe for a file too large to load, built
+    from one chunked pass of mergeable partial aggregates. Distinct counts
+    past the tracking cap are lower bounds (flagged "unique_approx").
+    """
+    scan = scan_profile(filepath, LINE_POINTS, CATEGORICAL_DTYPES)
+    dtypes = scan["dtypes"]
+    # Same column classification as profile_dataframe, from the first rows
+    numeric_cols = scan["head"].select_dtypes(include=["number"]).columns.tolist()
+    categorical_cols = scan["head"].select_dtypes(include=CATEGORICAL_DTYPES).columns.tolist()
+
+    numeric_stats = {}
+    for col in numeric_cols:
+        partial = scan["numeric"][col]
+        count = partial["count"]
+        numeric_stats[str(col)] = {
+            "sum": _scalar(partial["sum"]),
+            "mean": _scalar(partial["sum"] / count) if count else None,
+            "min": _scalar(partial["min"]),
+            "max": _scalar(partial["max"]),
+            "count": _scalar(count),
+        }
+
+    categorical_stats = {}
+    for col in categorical_cols:
+        counts = scan["value_counts"][col].sort_values(ascending=False)
+        categorical_stats[str(col)] = {
+            "unique": int(len(counts)),
+            "top": [[_scalar(k), int(v)] for k, v in counts.head(TOP_K).items()],
+        }
+
+    charts = {"bar": None, "pie": None, "line": None}
+    if scan["group_by"] is not None:
+        cat_col, num_col = scan["group_by"]
+        if categorical_stats[str(cat_col)]["unique"] <= BAR_MAX_CATEGORIES:
+            grouped = scan["group_sums"].sort_values(ascending=False).head(10)
+            charts["bar"] = {
+                "x": str(cat_col),
+                "y": str(num_col),
+                "labels": [_scalar(k) for k in grouped.index],
+                "values": [_scalar(v) for v in grouped.values],
+            }
+    if categorical_cols:
+        cat_col = str(categorical_cols[0])
+        if categorical_stats[cat_col]["unique"] <= PIE_MAX_CATEGORIES:
+            top = categorical_stats[cat_col]["top"][:8]
+            charts["pie"] = {
+                "column": cat_col,
+                "labels": [k for k, _ in top],
+                "values": [v for _, v in top],
+            }
+    if numeric_cols:
+        head = scan["head"][numeric_cols[:3]]
+        charts["line"] = {
+            "series": {str(col): [_scalar(v) for v in head[col].values] for col in head.columns}
+        }
+
+    schema = []
+    for col, dtype in dtypes.items():
+        entry = {
+            "name": str(col),
+            "dtype": str(dtype),
+            "nulls": int(scan["nulls"][col]),
+        }
+        # Distinct values are only tallied for categorical columns
+        if col in scan["value_counts"]:
+            entry["unique"] = int(len(scan["value_counts"][col]))
+            if not scan["exact_counts"][col]:
+                entry["unique_approx"] = True
+        if str(col) in numeric_stats:
+            entry["min"], entry["max"] = numeric_stats[str(col)]["min"], numeric_stats[str(col)]["max"]
+        elif str(col) in categorical_stats:
+            entry["samples"] = [k for k, _ in categorical_stats[str(col)]["top"][:SCHEMA_SAMPLES]]
+        schema.append(entry)
+
+    return {
+        "version": PROFILE_VERSION,
+        "rows": int(scan["rows"]),
+        "columns": int(len(dtypes)),
+        "numeric_cols": [str(c) for c in numeric_cols],
+        "categorical_cols": [str(c) for c in categorical_cols],
+        "numeric": numeric_stats,
+        "categorical": categorical_stats,
+        "charts": charts,
+        "schema": schema,
+        "out_of_core": True,
+    }
+
+
+def _profile_path(content_hash: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{content_hash}.json")
+
+
+def get_profile(filepath: str, content_hash: str = None) -> dict:
+    """
+    Return the profile for a tabular file, computing it at most once per
+    content hash. Repeat calls are served from memory or the JSON on disk.
+    """
+    content_hash = content_hash or hash_file(filepath)
+
+    with _lock:
+        profile = _memory_profiles.get(content_hash)
+        if profile:
+            _memory_profiles.move_to_end(content_hash)
+    if profile:
+        return profile
+
+    path = _profile_path(content_hash)
+    try:
+        with open(path) as f:
+            profile = json.load(f)
+        if profile.get("version") != PROFILE_VERSION:
+            profile = None
+    except (OSError, ValueError):
+        profile = None
+
+    if profile is None:
+        if is_large_table(filepath):
+            profile = profile_large_table(filepath)
+        else:
+            profile = profile_dataframe(optimize_dtypes(read_table(filepath))[0])
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(profile, f)
+        os.replace(tmp_path, path)
+
+    with _lock:
+        _remember(_memory_profiles, content_hash, profile, PROFILE_MEMORY_ENTRIES)
+    return profile
+
+
+def remove_profile(content_hash: str):
+    """Forget a content hash's profile, in memory and on disk"""
+    if not content_hash:
+        return
+    with _lock:
+        _memory_profiles.pop(content_hash, None)
+    try:
+        os.remove(_profile_path(content_hash))
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error removing profile {content_hash}: {str(e)}")
+
+
+def precompute_profile(filepath: str, content_hash: str):
+    """Background task: profile an upload so the first chat turn doesn't have to"""
+    try:
+        get_profile(filepath, content_hash)
+    except Exception as e:
+        print(f"Profiling failed for {filepath}: {str(e)}")
+
+
+def _short(value, limit: int = 30) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def schema_digest(profile: dict) -> str:
+    """Compact text description of a profiled dataset for the agent prompt"""
+    lines = [f"The dataframe has {profile['rows']:,} rows and {profile['columns']} columns:"]
+    for entry in profile["schema"][:DIGEST_MAX_COLUMNS]:
+        details = [entry["dtype"], f"{entry['nulls']:,} nulls"]
+        if "unique" in entry:
+            unique = f"{entry['unique']:,}" + ("+" if entry.get("unique_approx") else "")
+            details.append(f"{unique} unique")
+        if "min" in entry:
+            details.append(f"min {_short(entry['min'])}, max {_short(entry['max'])}")
+        if entry.get("samples"):
+            details.append("e.g. " + ", ".join(_short(v) for v in entry["samples"]))
+        lines.append(f"- {entry['name']}: " + "; ".join(details))
+    if len(profile["schema"]) > DIGEST_MAX_COLUMNS:
+        lines.append(f"- ... {len(profile['schema']) - DIGEST_MAX_COLUMNS} more columns")
+    return "\n".join(lines)
@@ -0,0 +1,316 @@
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import pandas as pd
+
+from . import out_of_core
+from .columnar import is_large_table
+from .data_cache import load_dataframe
+from .out_of_core import TooManyGroups
+
+# Rule-based answers for simple aggregation questions ("sum of sales",
+# "average price by category", "top 5 customers by revenue", "how many rows").
+# Anything that doesn't parse, or names a column we can't resolve, returns
+# None and goes to the LLM agent as before.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes")
+FAST_PATH_MAX_GROUPS = int(os.getenv("FAST_PATH_MAX_GROUPS", "50"))
+
+AGGREGATES = {
+    "sum": "sum", "total": "sum",
+    "average": "mean", "avg": "mean", "mean": "mean",
+    "median": "median",
+    "min": "min", "minimum": "min", "lowest": "min", "smallest": "min",
+    "max": "max", "maximum": "max", "highest": "max", "largest": "max",
+    "std": "std", "standard deviation": "std",
+    "count": "count", "number": "count",
+}
+AGGREGATE_LABELS = {
+    "sum": "Total", "mean": "Average", "median": "Median", "min": "Minimum",
+    "max": "Maximum", "std": "Standard deviation", "count": "Count",
+}
+_AGG = "|".join(sorted((re.escape(k) for k in AGGREGATES), key=len, reverse=True))
+_ROWS = r"(?:rows|records|entries|lines|observations)"
+_GROUP = r"(?:by|per|for each|for every|grouped by|across)"
+
+_PUNCTUATION_RE = re.compile(r"[?!.,;:`\"]")
+_LEADING_RE = re.compile(
+    r"^(?:(?:what is|whats|what are|show me|show|give me|tell me|calculate|compute|"
+    r"find|get|list|display|please|can you|could you|the)\s+)+"
+)
+
+ROW_COUNT_RE = re.compile(
+    rf"^(?:(?:how many|number of|count of|total number of|count(?: the)?)\s+{_ROWS}"
+    r"(?:\s+(?:are there|does it have|do we have|in (?:the )?(?:data|dataset|file|table|df)))?"
+    r"|row count)$"
+)
+COLUMNS_RE = re.compile(r"^(?:(?:what|which)\s+)?(?:are\s+)?(?:the\s+)?(?:columns|column names|fields)(?:\s+are there)?$")
+UNIQUE_RE = re.compile(
+    r"^(?:how many|number of|count of)\s+(?:unique|distinct|different)\s+(?P<column>.+?)(?:\s+are there)?$"
+)
+TOP_RE = re.compile(
+    r"^(?P<direction>top|bottom|highest|lowest|largest|smallest|best|worst)\s+(?P<n>\d+)\s+(?P<group>.+?)"
+    rf"(?:\s+(?:by|in terms of|based on)\s+(?:(?P<agg>{_AGG})\s+(?:of\s+)?)?(?P<measure>.+))?$"
+)
+COUNT_BY_RE = re.compile(rf"^(?:count|number|how many)\s+(?:of\s+)?(?P<measure>.+?)\s+{_GROUP}\s+(?P<group>.+)$")
+AGG_RE = re.compile(
+    rf"^(?P<agg>{_AGG})\s+(?:of\s+)?(?:the\s+|all\s+)?(?P<measure>.+?)(?:\s+{_GROUP}\s+(?:the\s+|each\s+)?(?P<group>.+))?$"
+)
+
+
+def normalize_question(question: str) -> str:
+    # Apostrophes are dropped rather than spaced so "what's" reads as "whats"
+    text = " ".join(_PUNCTUATION_RE.sub(" ", question.lower().replace("'", "")).split())
+    return _LEADING_RE.sub("", text).strip()
+
+
+def _normalize_name(name) -> str:
+    return " ".join(re.sub(r"[_\-\s]+", " ", str(name).lower()).split())
+
+
+def resolve_column(df: pd.DataFrame, phrase: str) -> Optional[str]:
+    """Map a phrase from the question onto exactly one column name"""
+    phrase = _normalize_name(re.sub(r"^(?:the|each|every|all)\s+", "", phrase.strip()))
+    names = {_normalize_name(c): c for c in df.columns}
+    candidates = [phrase]
+    if phrase.endswith("ies"):
+        candidates.append(phrase[:-3] + "y")
+    if phrase.endswith("es"):
+        candidates.append(phrase[:-2])
+    if phrase.endswith("s"):
+        candidates.append(phrase[:-1])
+    candidates += [c + "s" for c in list(candidates)]
+    for candidate in candidates:
+        if candidate in names:
+            return names[candidate]
+    return None
+
+
+def _format_value(value) -> str:
+    if isinstance(value, (int, float)) or hasattr(value, "item"):
+        value = value.item() if hasattr(value, "item") else value
+        if isinstance(value, float):
+            if value.is_integer() and abs(value) < 1e15:
+                return f"{int(value):,}"
+            return f"{value:,.2f}"
+        if isinstance(value, int) and not isinstance(value, bool):
+            return f"{value:,}"
+    return str(value)
+
+
+def _table(series: pd.Series, value_label: str) -> str:
+    shown = series.head(FAST_PATH_MAX_GROUPS)
+    frame = pd.DataFrame({
+        series.index.name or "group": [str(i) for i in shown.index],
+        value_label: [_format_value(v) for v in shown.values],
+    })
+    text = frame.to_markdown(index=False)
+    if len(series) > len(shown):
+        text += f"\n\n(showing {len(shown)} of {len(series):,} groups)"
+    return text
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+class FrameSource:
+    """Aggregates over a DataFrame held in memory"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def rows(self) -> int:
+        return len(self.df)
+
+    def nunique(self, column: str) -> int:
+        return self.df[column].nunique()
+
+    def value_counts(self, column: str) -> pd.Series:
+        counts = self.df[column].value_counts()
+        counts.index.name = column
+        return counts
+
+    def aggregate(self, column: str, agg: str, group: Optional[str] = None):
+        if group is None:
+            return self.df[column].agg(agg)
+        return self.df.groupby(group, observed=True, sort=False)[column].agg(agg)
+
+
+class ChunkedSource:
+    """
+    Aggregates over a large CSV streamed in chunks. `df` is the row sample,
+    used only to resolve column names and dtypes.
+    """
+
+    def __init__(self, filepath: str, sample: pd.DataFrame):
+        self.filepath = filepath
+        self.df = sample
+
+    def rows(self) -> int:
+        return out_of_core.count_rows(self.filepath)
+
+    def nunique(self, column: str) -> int:
+        return out_of_core.nunique(self.filepath, column)
+
+    def value_counts(self, column: str) -> pd.Series:
+        return out_of_core.value_counts(self.filepath, column)
+
+    def aggregate(self, column: str, agg: str, group: Optional[str] = None):
+        # None for aggregates that can't be merged across chunks (median)
+        return out_of_core.aggregate(self.filepath, column, agg, group)
+
+
+def _aggregate(source, agg: str, measure: str, group: Optional[str]):
+    """Vectorized scalar or grouped aggregate; None when it doesn't apply"""
+    df = source.df
+    if agg == "count":
+        if group is None:
+            return None
+        group_col = resolve_column(df, group)
+        if group_col is None:
+            return None
+        counts = source.value_counts(group_col)
+        return f"Number of rows by **{group_col}**:\n\n" + _table(counts, "count")
+
+    column = resolve_column(df, measure)
+    if column is None:
+        return None
+    values = df[column]
+    if agg in ("min", "max"):
+        if not (_is_numeric(values) or pd.api.types.is_datetime64_any_dtype(values)):
+            return None
+    elif not _is_numeric(values):
+        return None
+
+    label = AGGREGATE_LABELS[agg]
+    if group is None:
+        value = source.aggregate(column, agg)
+        if value is None:
+            return None
+        return f"{label} of **{column}**: {_format_value(value)}"
+
+    group_col = resolve_column(df, group)
+    if group_col is None or group_col == column:
+        return None
+    result = source.aggregate(column, agg, group_col)
+    if result is None:
+        return None
+    result = result.sort_values(ascending=False)
+    return f"{label} of **{column}** by **{group_col}**:\n\n" + _table(result, f"{agg} {column}")
+
+
+def _top(source, match) -> Optional[str]:
+    df = source.df
+    n = int(match["n"])
+    if n <= 0:
+        return None
+    ascending = match["direction"] in ("bottom", "lowest", "smallest", "worst")
+    group_col = resolve_column(df, match["group"])
+    if group_col is None:
+        return None
+    which = "Bottom" if ascending else "Top"
+
+    if not match["measure"]:
+        # No measure named: rank by number of rows
+        ranked = source.value_counts(group_col).sort_values(ascending=ascending).head(n)
+        return f"{which} {n} **{group_col}** by number of rows:\n\n" + _table(ranked, "count")
+
+    column = resolve_column(df, match["measure"])
+    if column is None or column == group_col or not _is_numeric(df[column]):
+        return None
+    agg = AGGREGATES.get(match["agg"] or "sum", "sum")
+    if agg == "count":
+        return None
+    grouped = source.aggregate(column, agg, group_col)
+    if grouped is None:
+        return None
+    ranked = grouped.nsmallest(n) if ascending else grouped.nlargest(n)
+    return f"{which} {n} **{group_col}** by {AGGREGATE_LABELS[agg].lower()} **{column}**:\n\n" + _table(ranked, f"{agg} {column}")
+
+
+def answer_source(source, question: str) -> Optional[str]:
+    """Answer a simple aggregation question directly, or None if it doesn't parse"""
+    q = normalize_question(question)
+    if not q:
+        return None
+    df = source.df
+
+    if ROW_COUNT_RE.match(q):
+        return f"The dataset has **{source.rows():,}** rows."
+    if COLUMNS_RE.match(q):
+        columns = "\n".join(f"- {c} ({df[c].dtype})" for c in df.columns)
+        return f"The dataset has {len(df.columns)} columns:\n\n{columns}"
+
+    match = UNIQUE_RE.match(q)
+    if match:
+        column = resolve_column(df, match["column"])
+        if column is None:
+            return None
+        return f"**{column}** has **{source.nunique(column):,}** unique values."
+
+    match = TOP_RE.match(q)
+    if match:
+        return _top(source, match)
+
+    match = COUNT_BY_RE.match(q)
+    if match:
+        return _aggregate(source, "count", match["measure"], match["group"])
+
+    match = AGG_RE.match(q)
+    if match:
+        return _aggregate(source, AGGREGATES[match["agg"]], match["measure"], match["group"])
+    return None
+
+
+def answer_dataframe(df: pd.DataFrame, question: str) -> Optional[str]:
+    return answer_source(FrameSource(df), question)
+
+
+class QueryEngine:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.answered = 0
+        self.fallbacks = 0
+        self.seconds_total = 0.0
+
+    def answer(self, filepath: str, file_id, question: str) -> Optional[str]:
+        """Fast-path answer over the cached DataFrame (or streamed file), or None to use the agent"""
+        if not self.enabled:
+            return None
+        start = time.perf_counter()
+        try:
+            df = load_dataframe(filepath, file_id)
+            if is_large_table(filepath):
+                # df is only a sample; aggregate over the whole file in chunks
+                response = answer_source(ChunkedSource(filepath, df), question)
+            else:
+                response = answer_dataframe(df, question)
+        except TooManyGroups:
+            response = None
+        except Exception as e:
+            print(f"Fast-path query failed: {str(e)}")
+            response = None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            if response is None:
+                self.fallbacks += 1
+            else:
+                self.answered += 1
+                self.seconds_total += elapsed
+        return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "answered": self.answered,
+                "fallbacks": self.fallbacks,
+                "answer_seconds_avg": self.seconds_total / self.answered if self.answered else 0.0,
+            }
+
+
+query_engine = QueryEngine(FAST_PATH_ENABLED)
@@ -1,70 +1,226 @@
 from langchain_community.document_loaders import PyPDFLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.chains import RetrievalQA
 from .agent_factory import get_llm
+from .embeddings import get_embeddings
+from .epub import EPubLoader
+from .retrieval import KEYWORD_INDEX_FILE, HybridRetriever, build_keyword_index, load_keyword_index
+from .vector_registry import VECTOR_DB_DIR, close_vectorstore, vector_registry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import os
 
-# Persistent directory for vector DB
-VECTOR_DB_DIR = "vector_store"
-os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+# Streaming ingestion: chunks per embedding call and parallel embedders
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# For the progress total before the text is read: text per PDF page, and the
+# share of an EPUB chapter's XHTML that is text rather than markup
+PDF_CHARS_PER_PAGE = 2000
+EPUB_TEXT_RATIO = 0.5
+
+class IngestionCancelled(Exception):
+    pass
 
 class RagPipeline:
     def __init__(self, filepath: str, file_id: str):
         self.filepath = filepath
+        self.file_id = file_id
         self.collection_name = f"collection_{file_id}"
         
-        # Use Hugging Face embeddings (free)
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
+        # Shared Hugging Face embeddings (free), loaded once per process
+        self.embeddings = get_embeddings()
             
         self.persist_directory = os.path.join(VECTOR_DB_DIR, self.collection_name)
         
-    def ingest(self):
-        """Loads data, splits it, and saves to Vector DB"""
+    def is_indexed(self) -> bool:
+        return os.path.exists(self.persist_directory)
+
+    def _load_documents(self):
+        """Yield pages/documents lazily instead of loading the whole file"""
         if self.filepath.endswith(".pdf"):
             loader = PyPDFLoader(self.filepath)
+        elif self.filepath.endswith(".epub"):
+            loader = EPubLoader(self.filepath)
         else:
             loader = TextLoader(self.filepath)
-            
-        documents = loader.load()
-        
-        # Split text while keeping page metadata
+        return loader.lazy_load()
+
+    def _estimate_chunks(self) -> int:
+        """Rough chunk count from the page count or file size, for progress reports"""
+        try:
+            if self.filepath.endswith(".pdf"):
+                from pypdf import PdfReader
+                chars = len(PdfReader(self.filepath).pages) * PDF_CHARS_PER_PAGE
+            elif self.filepath.endswith(".epub"):
+                chars = EPubLoader(self.filepath).markup_bytes() * EPUB_TEXT_RATIO
+            else:
+                chars = os.path.getsize(self.filepath)
+        except Exception as e:
+            print(f"Could not estimate the size of {self.filepath}: {str(e)}")
+            return 0
+        return max(1, int(chars // (CHUNK_SIZE - CHUNK_OVERLAP)))
+
+    def _iter_batches(self, text_splitter):
+        batch = []
+        for document in self._load_documents():
+            # Split text while keeping page metadata
+            for chunk in text_splitter.split_documents([document]):
+                batch.append(chunk)
+                if len(batch) >= INGEST_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _embed_batch(self, batch, ids):
+        return batch, ids, self.embeddings.embed_documents([doc.page_content for doc in batch])
+
+    @staticmethod
+    def _chunk_ids(batch, seen_counts):
+        """
+        Content-addressed ids: the hash of the chunk text plus its occurrence
+        number, so unchanged chunks keep their id across re-uploads
+        """
+        ids = []
+        for doc in batch:
+            chunk_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+            occurrence = seen_counts.get(chunk_hash, 0)
+            seen_counts[chunk_hash] = occurrence + 1
+            doc.metadata["chunk_hash"] = chunk_hash
+            ids.append(f"{chunk_hash}:{occurrence}")
+        return ids
+
+    def ingest(self, progress=None, cancel=None) -> dict:
+        """
+        Loads data, splits it, and saves to Vector DB.
+
+        Documents are streamed page by page and embedded in batches on a
+        thread pool; each finished batch is upserted straight away, so only a
+        bounded number of batches is ever held in memory.
+
+        Re-ingesting an existing collection is incremental: chunks whose
+        content hash is already stored only get their metadata (page,
+        start_index) refreshed, new chunks are embedded, and chunks that no
+        longer appear are deleted. The BM25 keyword index is rebuilt from the
+        final collection at the end. Setting the `cancel` event stops it
+        between batches with IngestionCancelled.
+        """
+        report = progress or (lambda stage, done=0, total=0: None)
+
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
             add_start_index=True
         )
-        texts = text_splitter.split_documents(documents)
-        
-        # Store in Chroma
-        vectorstore = Chroma.from_documents(
-            documents=texts,
-            embedding=self.embeddings,
+        vectorstore = self._open_vectorstore()
+        try:
+            return self._ingest(vectorstore, text_splitter, report, cancel)
+        finally:
+            close_vectorstore(vectorstore)
+
+    def _ingest(self, vectorstore, text_splitter, report, cancel=None) -> dict:
+        collection = vectorstore._collection
+        existing_ids = set(collection.get(include=[])["ids"])
+
+        seen_ids = set()
+        seen_counts = {}
+        stats = {"embedded": 0, "reused": 0, "deleted": 0}
+        max_in_flight = EMBED_WORKERS * 2
+
+        def upsert(future):
+            batch, ids, vectors = future.result()
+            # Embeddings are precomputed, so write to the collection directly
+            collection.upsert(
+                ids=ids,
+                embeddings=vectors,
+                documents=[doc.page_content for doc in batch],
+                metadatas=[doc.metadata or None for doc in batch],
+            )
+            stats["embedded"] += len(batch)
+
+        # Raised to the running count if the estimate turns out low; 0 is unknown
+        estimate = self._estimate_chunks()
+
+        def progress(stage):
+            done = stats["embedded"] + stats["reused"]
+            report(stage, done, max(estimate, done) if estimate else 0)
+
+        progress("embedding")
+        with ThreadPoolExecutor(max_workers=EMBED_WORKERS, thread_name_prefix="embed") as pool:
+            in_flight = deque()
+            for batch in self._iter_batches(text_splitter):
+                # Checked between batches; batches in flight finish first
+                if cancel is not None and cancel.is_set():
+                    raise IngestionCancelled(self.collection_name)
+                ids = self._chunk_ids(batch, seen_counts)
+                seen_ids.update(ids)
+
+                known = [i for i, chunk_id in enumerate(ids) if chunk_id in existing_ids]
+                if known:
+                    collection.update(
+                        ids=[ids[i] for i in known],
+                        metadatas=[batch[i].metadata for i in known],
+                    )
+                    stats["reused"] += len(known)
+
+                fresh = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing_ids]
+                if fresh:
+                    in_flight.append(pool.submit(
+                        self._embed_batch, [batch[i] for i in fresh], [ids[i] for i in fresh]
+                    ))
+                # Backpressure: don't read ahead of the embedders
+                if len(in_flight) >= max_in_flight:
+                    upsert(in_flight.popleft())
+                progress("embedding")
+            while in_flight:
+                upsert(in_flight.popleft())
+                progress("embedding")
+
+        stale_ids = list(existing_ids - seen_ids)
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+            stats["deleted"] = len(stale_ids)
+
+        done = stats["embedded"] + stats["reused"]
+        report("keyword_index", done, done)
+        build_keyword_index(collection, self.persist_directory)
+
+        report("done", done, done)
+        return stats
+
+    def _open_vectorstore(self):
+        return Chroma(
             persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
             collection_name=self.collection_name
         )
-        return vectorstore
 
-    def get_chain(self):
-        """Returns a RetrievalQA chain"""
-         # Check if vectorstore exists, if not ingest
-        if not os.path.exists(self.persist_directory):
-             vectorstore = self.ingest()
-        else:
-            vectorstore = Chroma(
-                persist_directory=self.persist_directory, 
-                embedding_function=self.embeddings,
-                collection_name=self.collection_name
-            )
+    def _open_store(self):
+        vectorstore = self._open_vectorstore()
+        return vectorstore, load_keyword_index(vectorstore._collection, self.persist_directory)
+
+    def _index_signature(self):
+        # Every ingest rewrites the keyword index last
+        try:
+            return os.stat(os.path.join(self.persist_directory, KEYWORD_INDEX_FILE)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _build_chain(self, handle, streaming: bool):
+        llm = get_llm(streaming=streaming)
+
+        # Dense + BM25 candidates, fused, de-overlapped and optionally reranked
+        retriever = HybridRetriever(
+            collection=handle.vectorstore._collection,
+            embeddings=self.embeddings,
+            keyword_index=handle.keyword_index,
+            lease=handle.lease,
+        )
 
-        llm = get_llm()
-        
-        # Custom prompt to force citation
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 5})
-        
         chain = RetrievalQA.from_chain_type(
             llm=llm,
             chain_type="stuff",
@@ -72,3 +228,17 @@ class RagPipeline:
             return_source_documents=True
         )
         return chain
+
+    def get_chain(self, streaming: bool = False):
+        """Returns a RetrievalQA chain, reusing the open collection across questions"""
+        # Indexing runs in the background ingestion queue, never inline here
+        if not self.is_indexed():
+            raise RuntimeError("Document has not been indexed yet")
+
+        return vector_registry.get_chain(
+            self.file_id,
+            self._index_signature,
+            streaming,
+            open_store=self._open_store,
+            build_chain=self._build_chain,
+        )
@@ -0,0 +1,216 @@
+# Charts are described by small JSON-able specs and drawn in worker processes
+# with matplotlib's object-oriented Figure API, so API workers never block on
+# (or share global pyplot state with) a render.
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+STATIC_DIR = "static/plots"
+os.makedirs(STATIC_DIR, exist_ok=True)
+
+CHART_RENDER_WORKERS = int(os.getenv("CHART_RENDER_WORKERS", "2"))
+CHART_DPI = 150
+
+
+def _init_worker():
+    # Pay the matplotlib import once per worker instead of per chart
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.figure  # noqa: F401
+
+
+def _draw_bar(fig, spec):
+    import seaborn as sns
+    ax = fig.subplots()
+    values, labels = spec["values"], spec["labels"]
+    colors = sns.color_palette("viridis", len(values))
+    bars = ax.bar(range(len(values)), values, color=colors)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha='right')
+    ax.set_xlabel(spec["x_label"], fontsize=12, fontweight='bold')
+    ax.set_ylabel(spec["y_label"], fontsize=12, fontweight='bold')
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=20)
+    fig.tight_layout()
+
+    # Add value labels on bars
+    for rect in bars:
+        height = rect.get_height()
+        ax.text(rect.get_x() + rect.get_width()/2., height, f'{height:,.0f}',
+                ha='center', va='bottom', fontsize=9)
+
+
+def _draw_pie(fig, spec):
+    from matplotlib import colormaps
+    ax = fig.subplots()
+    values = spec["values"]
+    colors = colormaps["Set3"](range(len(values)))
+    ax.pie(values, labels=spec["labels"], autopct='%1.1f%%',
+           startangle=90, colors=colors, textprops={'fontsize': 10})
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=20)
+    ax.axis('equal')
+
+
+def _draw_line(fig, spec):
+    ax = fig.subplots()
+    for label, series in spec["series"].items():
+        x = series.get("x") or range(len(series["y"]))
+        # Long (downsampled) series are drawn without point markers
+        marker = 'o' if spec.get("markers", True) else None
+        ax.plot(x, series["y"], marker=marker, linewidth=2, markersize=4, label=label)
+    ax.set_xlabel(spec.get("x_label", "Index"), fontsize=12, fontweight='bold')
+    ax.set_ylabel(spec.get("y_label", "Value"), fontsize=12, fontweight='bold')
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=20)
+    ax.legend(loc='best', fontsize=10)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+
+def _draw_scatter(fig, spec):
+    ax = fig.subplots()
+    ax.scatter(spec["x"], spec["y"], s=12, alpha=0.6)
+    ax.set_xlabel(spec["x_label"], fontsize=12, fontweight='bold')
+    ax.set_ylabel(spec["y_label"], fontsize=12, fontweight='bold')
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, alpha=0.3)
+    fig.tight_layout()
+
+
+def _draw_hist(fig, spec):
+    # Bin counts are precomputed, so this only draws the bars
+    ax = fig.subplots()
+    edges = spec["edges"]
+    ax.stairs(spec["counts"], edges, fill=True, alpha=0.8)
+    ax.set_xlabel(spec["x_label"], fontsize=12, fontweight='bold')
+    ax.set_ylabel("Count", fontsize=12, fontweight='bold')
+    ax.set_title(spec["title"], fontsize=14, fontweight='bold', pad=20)
+    fig.tight_layout()
+
+
+_DRAWERS = {
+    "bar": _draw_bar,
+    "pie": _draw_pie,
+    "line": _draw_line,
+    "scatter": _draw_scatter,
+    "hist": _draw_hist,
+}
+_FIGSIZES = {"bar": (10, 6), "pie": (8, 8), "line": (12, 6), "scatter": (10, 6), "hist": (10, 6)}
+
+
+def render_chart(spec: dict, path: str) -> float:
+    """Draw a chart spec to a PNG. Runs inside a pool worker."""
+    from matplotlib.figure import Figure
+
+    start = time.perf_counter()
+    fig = Figure(figsize=spec.get("figsize") or _FIGSIZES[spec["type"]])
+    _DRAWERS[spec["type"]](fig, spec)
+
+    # Write to a temp name so readers never see a half-written image
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format="png", dpi=CHART_DPI, bbox_inches='tight', facecolor='white')
+    os.replace(tmp_path, path)
+    return time.perf_counter() - start
+
+
+class ChartRenderer:
+    """Bounded process pool that renders chart specs and tracks pending images"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = None
+        self._pending = {}  # plot name -> Future
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.render_seconds_total = 0.0
+        self.render_seconds_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return self._executor
+
+    def start(self):
+        """Spawn the workers now so the first dashboard doesn't pay for it"""
+        with self._lock:
+            executor = self._get_executor()
+        for _ in range(self.max_workers):
+            executor.submit(os.getpid)
+
+    def submit(self, spec: dict, name: str = None) -> str:
+        """Queue a chart for rendering and return its file name under static/plots"""
+        # Specs are data for the fixed drawers above, never code to run
+        if spec.get("type") not in _DRAWERS:
+            raise ValueError(f"Unsupported chart type: {spec.get('type')!r}")
+        name = name or f"{uuid.uuid4()}.png"
+        path = os.path.join(STATIC_DIR, name)
+        with self._lock:
+            if name in self._pending:
+                return name
+            try:
+                future = self._get_executor().submit(render_chart, spec, path)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); start a fresh pool
+                self._executor = None
+                future = self._get_executor().submit(render_chart, spec, path)
+            self._pending[name] = future
+            self.submitted += 1
+        future.add_done_callback(lambda f, name=name: self._on_done(name, f))
+        return name
+
+    def _on_done(self, name, future):
+        with self._lock:
+            self._pending.pop(name, None)
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            elapsed = future.result()
+            self.completed += 1
+            self.render_seconds_total += elapsed
+            self.render_seconds_max = max(self.render_seconds_max, elapsed)
+
+    def is_pending(self, name: str) -> bool:
+        with self._lock:
+            return name in self._pending
+
+    def pending(self, name: str):
+        """The render Future for a chart still being drawn, else None"""
+        with self._lock:
+            return self._pending.get(name)
+
+    def result(self, name: str, timeout: float = None):
+        """Block until a pending chart is written, re-raising any render error"""
+        future = self.pending(name)
+        if future is not None:
+            future.result(timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_depth": len(self._pending),
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "render_seconds_avg": (
+                    self.render_seconds_total / self.completed if self.completed else 0.0
+                ),
+                "render_seconds_max": self.render_seconds_max,
+            }
+
+
+chart_renderer = ChartRenderer(CHART_RENDER_WORKERS)
@@ -0,0 +1,138 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Answers keyed by (file content hash, normalized question, context digest);
+# a changed file has a new hash, so its old answers can never be served.
+# Answers that depend on the conversation carry a digest of the history they
+# were given; standalone answers have an empty context.
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+# Optional near-duplicate lookup by question embedding similarity
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(_PUNCTUATION_RE.sub(" ", question.lower()).split())
+
+
+def context_digest(history: str) -> str:
+    if not history:
+        return ""
+    return hashlib.sha256(history.encode("utf-8")).hexdigest()
+
+
+def _cosine(a, b) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class ResponseCache:
+    def __init__(self, ttl_seconds: int, max_entries: int, semantic: bool, similarity: float):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self._entries = OrderedDict()  # (content_hash, question, context) -> (response, created, vector)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _embed(self, question: str):
+        from .embeddings import get_embeddings
+        try:
+            return get_embeddings().embed_query(question)
+        except Exception:
+            return None
+
+    def get(self, content_hash: str, question: str, contexts=("",)):
+        """
+        Return (response, "exact" | "semantic") or None, trying the context
+        digests in order
+        """
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            for context in contexts:
+                key = (content_hash, normalized, context)
+                entry = self._entries.get(key)
+                if entry and now - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0], "exact"
+                if entry:
+                    del self._entries[key]
+            candidates = [
+                (k, e) for k, e in self._entries.items()
+                if k[0] == content_hash and k[2] in contexts and e[2] is not None
+                and now - e[1] <= self.ttl_seconds
+            ] if self.semantic else []
+
+        if candidates:
+            vector = self._embed(normalized)
+            if vector is not None:
+                best_key, best_score = None, self.similarity
+                for k, e in candidates:
+                    score = _cosine(vector, e[2])
+                    if score >= best_score:
+                        best_key, best_score = k, score
+                if best_key is not None:
+                    with self._lock:
+                        entry = self._entries.get(best_key)
+                        if entry:
+                            self._entries.move_to_end(best_key)
+                            self.semantic_hits += 1
+                            return entry[0], "semantic"
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, content_hash: str, question: str, response: str, context: str = ""):
+        normalized = normalize_question(question)
+        vector = self._embed(normalized) if self.semantic else None
+        key = (content_hash, normalized, context)
+        with self._lock:
+            self._entries[key] = (response, time.time(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, content_hash: str):
+        """Forget every answer computed against a file's content"""
+        if not content_hash:
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == content_hash]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "semantic": self.semantic,
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache(
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    semantic=RESPONSE_CACHE_SEMANTIC,
+    similarity=RESPONSE_CACHE_SIMILARITY,
+)
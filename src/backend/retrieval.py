@@ -0,0 +1,335 @@
+# Hybrid retrieval for RAG: a local BM25 keyword index built at ingest time
+# is fused with dense vector search by reciprocal rank fusion, overlapping
+# chunks are trimmed to the text not already selected, and the survivors are
+# optionally reranked by a small local cross-encoder before being stuffed
+# into the prompt.
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from typing import Any, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+RAG_DENSE_K = int(os.getenv("RAG_DENSE_K", "20"))
+RAG_KEYWORD_K = int(os.getenv("RAG_KEYWORD_K", "20"))
+# Chunks that end up in the prompt
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "4"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# A chunk with less new text than this after trimming overlap is dropped
+RAG_MIN_CHUNK_CHARS = int(os.getenv("RAG_MIN_CHUNK_CHARS", "200"))
+RAG_RERANK = os.getenv("RAG_RERANK", "false").lower() in ("1", "true", "yes")
+RAG_RERANKER_MODEL = os.getenv("RAG_RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Fused candidates scored by the cross-encoder
+RAG_RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "12"))
+
+KEYWORD_INDEX_FILE = "bm25.json"
+KEYWORD_INDEX_VERSION = 1
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Chunks read back from Chroma per page while building the index
+BUILD_PAGE_SIZE = 1000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._-][a-z0-9]+)*")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its of on or "
+    "that the their then there these this to was were what when which who will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    # Dotted/hyphenated terms (v2.1, x86-64, snake_case) stay one token
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class KeywordIndex:
+    """BM25 inverted index over the chunks of one collection"""
+
+    def __init__(self, ids: List[str], lengths: List[int], postings: dict):
+        self.ids = ids
+        self.lengths = lengths
+        self.postings = postings  # term -> [[doc, term frequency], ...]
+        self.avg_length = (sum(lengths) / len(lengths)) if lengths else 0.0
+
+    @classmethod
+    def build(cls, chunks) -> "KeywordIndex":
+        """Index (id, text) pairs"""
+        ids, lengths, postings = [], [], {}
+        for chunk_id, text in chunks:
+            doc = len(ids)
+            terms = tokenize(text or "")
+            ids.append(chunk_id)
+            lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append([doc, tf])
+        return cls(ids, lengths, postings)
+
+    @classmethod
+    def from_collection(cls, collection) -> "KeywordIndex":
+        def chunks():
+            offset = 0
+            while True:
+                page = collection.get(include=["documents"], limit=BUILD_PAGE_SIZE, offset=offset)
+                if not page["ids"]:
+                    return
+                yield from zip(page["ids"], page["documents"])
+                offset += len(page["ids"])
+        return cls.build(chunks())
+
+    def save(self, path: str):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": KEYWORD_INDEX_VERSION,
+                "ids": self.ids,
+                "lengths": self.lengths,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["KeywordIndex"]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != KEYWORD_INDEX_VERSION:
+            return None
+        return cls(data["ids"], data["lengths"], data["postings"])
+
+    def search(self, query: str, k: int) -> List[str]:
+        """Ids of the k best BM25 matches, best first"""
+        n = len(self.ids)
+        if not n:
+            return []
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc] / (self.avg_length or 1))
+                scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [self.ids[doc] for doc, _ in best]
+
+
+def build_keyword_index(collection, persist_directory: str) -> KeywordIndex:
+    """(Re)build a collection's keyword index from the chunks stored in it"""
+    index = KeywordIndex.from_collection(collection)
+    index.save(os.path.join(persist_directory, KEYWORD_INDEX_FILE))
+    return index
+
+
+def load_keyword_index(collection, persist_directory: str) -> KeywordIndex:
+    """
+    The collection's keyword index, rebuilt if it is missing (indexed before
+    BM25 existed), corrupt or in an older format
+    """
+    index = KeywordIndex.load(os.path.join(persist_directory, KEYWORD_INDEX_FILE))
+    if index is None:
+        index = build_keyword_index(collection, persist_directory)
+    return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[str]:
+    """Merge ranked id lists; an id scores sum(1 / (k + rank)) over the lists"""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def trim_overlaps(documents: List[Document], min_chars: int = RAG_MIN_CHUNK_CHARS) -> List[Document]:
+    """
+    Walk chunks best first and cut each one down to the longest run of text
+    not already covered by a better chunk from the same page (chunks share
+    200 characters with their neighbours). Chunks with too little new text
+    are dropped. Chunks without a start_index are kept as they are.
+    """
+    covered = {}  # (source, page) -> [(start, end), ...]
+    kept = []
+    for doc in documents:
+        start = doc.metadata.get("start_index")
+        if start is None:
+            kept.append(doc)
+            continue
+        key = (doc.metadata.get("source"), doc.metadata.get("page"))
+        end = start + len(doc.page_content)
+        spans = covered.setdefault(key, [])
+
+        # Uncovered pieces of [start, end)
+        pieces = [(start, end)]
+        for s, e in spans:
+            pieces = [
+                part
+                for a, b in pieces
+                for part in ((a, min(b, s)), (max(a, e), b))
+                if part[1] > part[0]
+            ]
+        if not pieces:
+            continue
+        a, b = max(pieces, key=lambda p: p[1] - p[0])
+        if b - a < min(min_chars, len(doc.page_content)):
+            continue
+        if (a, b) != (start, end):
+            doc = Document(
+                page_content=doc.page_content[a - start:b - start],
+                metadata={**doc.metadata, "start_index": a},
+            )
+        spans.append((a, b))
+        kept.append(doc)
+    return kept
+
+
+class Reranker:
+    """Lazily loaded cross-encoder shared by every collection"""
+
+    def __init__(self, model_name: str, enabled: bool):
+        self.model_name = model_name
+        self.enabled = enabled
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None and self.enabled:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                except Exception as e:
+                    print(f"Reranker unavailable, using fused ranking: {str(e)}")
+                    self.enabled = False
+        return self._model
+
+    def rerank(self, query: str, documents: List[Document]) -> List[Document]:
+        if not self.enabled or len(documents) < 2:
+            return documents
+        model = self._load()
+        if model is None:
+            return documents
+        scores = model.predict([(query, doc.page_content) for doc in documents])
+        order = sorted(range(len(documents)), key=lambda i: scores[i], reverse=True)
+        return [documents[i] for i in order]
+
+
+reranker = Reranker(RAG_RERANKER_MODEL, RAG_RERANK)
+
+
+class RetrievalStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.dense_hits = 0
+        self.keyword_hits = 0
+        self.keyword_only = 0
+        self.returned = 0
+        self.returned_chars = 0
+        self.dropped_overlaps = 0
+        self.reranked = 0
+        self.seconds_total = 0.0
+
+    def record(self, dense: int, keyword: int, keyword_only: int, returned: List[Document],
+               dropped: int, reranked: bool, elapsed: float):
+        with self._lock:
+            self.queries += 1
+            self.dense_hits += dense
+            self.keyword_hits += keyword
+            self.keyword_only += keyword_only
+            self.returned += len(returned)
+            self.returned_chars += sum(len(doc.page_content) for doc in returned)
+            self.dropped_overlaps += dropped
+            self.reranked += int(reranked)
+            self.seconds_total += elapsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            queries = self.queries or 1
+            return {
+                "queries": self.queries,
+                "reranker": reranker.model_name if reranker.enabled else None,
+                "reranked": self.reranked,
+                # Candidates found only by BM25, i.e. missed by dense search
+                "keyword_only_avg": self.keyword_only / queries,
+                "chunks_avg": self.returned / queries,
+                "prompt_chars_avg": self.returned_chars / queries,
+                "dropped_overlaps": self.dropped_overlaps,
+                "retrieval_seconds_avg": self.seconds_total / queries,
+            }
+
+
+retrieval_stats = RetrievalStats()
+
+
+def _documents(result, ids: Optional[List[str]] = None) -> dict:
+    """id -> Document from a Chroma get()/query() result"""
+    docs = {}
+    for chunk_id, text, metadata in zip(ids or result["ids"], result["documents"], result["metadatas"]):
+        docs[chunk_id] = Document(page_content=text or "", metadata=metadata or {})
+    return docs
+
+
+class HybridRetriever(BaseRetriever):
+    """Dense + BM25 retrieval over one Chroma collection"""
+
+    collection: Any
+    embeddings: Any
+    keyword_index: Any
+    # Context manager factory held around collection reads, so the handle
+    # isn't closed mid-query
+    lease: Any = None
+    dense_k: int = RAG_DENSE_K
+    keyword_k: int = RAG_KEYWORD_K
+    k: int = RAG_TOP_K
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        with self.lease() if self.lease else nullcontext():
+            return self._retrieve(query)
+
+    def _retrieve(self, query: str) -> List[Document]:
+        start = time.perf_counter()
+        dense = self.collection.query(
+            query_embeddings=[self.embeddings.embed_query(query)],
+            n_results=self.dense_k,
+            include=["documents", "metadatas"],
+        )
+        dense_ids = dense["ids"][0]
+        docs = _documents(
+            {"documents": dense["documents"][0], "metadatas": dense["metadatas"][0]}, dense_ids
+        )
+        keyword_ids = self.keyword_index.search(query, self.keyword_k)
+
+        fused = reciprocal_rank_fusion([dense_ids, keyword_ids])
+        candidates = fused[:max(self.k, RAG_RERANK_CANDIDATES if reranker.enabled else self.k * 3)]
+        missing = [chunk_id for chunk_id in candidates if chunk_id not in docs]
+        if missing:
+            docs.update(_documents(self.collection.get(ids=missing, include=["documents", "metadatas"])))
+        # Ids can go missing if the collection changed under a cached index
+        ranked = [docs[chunk_id] for chunk_id in candidates if chunk_id in docs]
+
+        ranked = reranker.rerank(query, ranked)
+        trimmed = trim_overlaps(ranked)
+        selected = trimmed[:self.k]
+
+        retrieval_stats.record(
+            dense=len(dense_ids),
+            keyword=len(keyword_ids),
+            keyword_only=len(set(keyword_ids) - set(dense_ids)),
+            returned=selected,
+            dropped=len(ranked) - len(trimmed),
+            reranked=reranker.enabled,
+            elapsed=time.perf_counter() - start,
+        )
+        return selected
@@ -1,14 +1,28 @@
+from datetime import datetime
 from typing import List, Optional
 import os
 import pandas as pd
 import json
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+import re
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlmodel import Session, col, or_, and_, select
 from pydantic import BaseModel
-from ..database import get_session
+from ..database import engine, get_session
 from ..models import User, ChatSession, Message, File
 from ..dependencies import get_current_user
-from ..agent_factory import get_agent
+from ..agent_factory import agent_stats, get_agent, release_agent, stopped_early
+from ..query_engine import query_engine
+from ..profiling import get_profile, hash_file
+from ..rendering import STATIC_DIR, chart_renderer
+from ..plot_cache import plot_cache, plot_url
+from ..ingestion import STATUS_DONE, STATUS_FAILED, ingestion_queue
+from ..execution import execution
+from ..response_cache import context_digest, response_cache
+from ..streaming import QueueCallbackHandler, sse_event
+from ..conversation import conversation_memory, with_history
+from ..pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, keyset_page, page_limit
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -20,7 +34,31 @@ class ChatResponse(BaseModel):
     response: str
     session_id: int
 
-@router.post("/sessions", response_model=ChatSession)
+class SessionResponse(BaseModel):
+    id: int
+    title: str
+    created_at: datetime
+    file_id: Optional[int]
+
+    class Config:
+        from_attributes = True
+
+class MessageResponse(BaseModel):
+    id: int
+    role: str
+    content: str
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
+
+# How long a chat request waits on a document that is still being indexed
+CHAT_INDEX_WAIT_SECONDS = float(os.getenv("CHAT_INDEX_WAIT_SECONDS", "20"))
+
+PLOT_NAME_RE = re.compile(r"^[A-Za-z0-9_-]+\.png$")
+PLOT_WAIT_SECONDS = 60
+
+@router.post("/sessions", response_model=SessionResponse)
 def create_session(
     file_id: int,
     current_user: User = Depends(get_current_user),
@@ -37,33 +75,58 @@ def create_session(
     session.refresh(chat_session)
     return chat_session
 
-@router.get("/sessions", response_model=List[ChatSession])
+@router.get("/sessions", response_model=List[SessionResponse])
 def list_sessions(
+    response: Response,
+    limit: Optional[int] = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    before: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    statement = select(ChatSession).where(ChatSession.user_id == current_user.id)
-    return session.exec(statement).all()
+    """The user's newest sessions, oldest first; older pages via ?before=<X-Next-Cursor>"""
+    statement = (
+        select(ChatSession.id, ChatSession.title, ChatSession.created_at, ChatSession.file_id)
+        .where(ChatSession.user_id == current_user.id)
+    )
+    if before is not None:
+        statement = statement.where(ChatSession.id < before)
+    rows = session.exec(page_limit(statement.order_by(col(ChatSession.id).desc()), limit)).all()
+    return keyset_page(rows, limit, response)
 
-@router.get("/history/{session_id}", response_model=List[Message])
+@router.get("/history/{session_id}", response_model=List[MessageResponse])
 def get_history(
     session_id: int,
+    response: Response,
+    limit: Optional[int] = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    before: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
+    """
+    The newest messages of a session in time order; older pages via
+    ?before=<X-Next-Cursor>. Served by the (session_id, timestamp) index.
+    """
     chat_session = session.get(ChatSession, session_id)
     if not chat_session or chat_session.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Session not found")
-        
-    return chat_session.messages
 
-@router.post("/message/{session_id}")
-def send_message(
-    session_id: int,
-    request: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db_session: Session = Depends(get_session)
-):
+    statement = (
+        select(Message.id, Message.role, Message.content, Message.timestamp)
+        .where(Message.session_id == session_id)
+    )
+    if before is not None:
+        # Keyset on (timestamp, id) of the cursor message
+        cursor = select(Message.timestamp).where(Message.id == before).scalar_subquery()
+        statement = statement.where(or_(
+            Message.timestamp < cursor,
+            and_(Message.timestamp == cursor, Message.id < before),
+        ))
+    statement = statement.order_by(col(Message.timestamp).desc(), col(Message.id).desc())
+    rows = session.exec(page_limit(statement, limit)).all()
+    return keyset_page(rows, limit, response)
+
+def load_chat_file(session_id: int, current_user: User, db_session: Session) -> File:
+    """Resolve the file behind a chat session, checking ownership and disk presence"""
     chat_session = db_session.get(ChatSession, session_id)
     if not chat_session or chat_session.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Session not found")
@@ -78,52 +141,221 @@ def send_message(
             status_code=404, 
             detail=f"File '{file.filename}' not found on disk. Please re-upload the file."
         )
+    return file
+
+def save_message(session_id: int, role: str, content: str) -> int:
+    with Session(engine) as session:
+        msg = Message(content=content, role=role, session_id=session_id)
+        session.add(msg)
+        session.commit()
+        session.refresh(msg)
+        return msg.id
+
+def start_turn(session_id: int, message: str, current_user: User):
+    """
+    Validate the session, save the user's message and return a detached File
+    with the conversation history that precedes the message. Runs on a
+    worker thread, so it opens its own session.
+    """
+    with Session(engine) as db_session:
+        file = load_chat_file(session_id, current_user, db_session)
+        db_session.expunge(file)
+        history = conversation_memory.context(db_session, session_id)
 
     # Save User Message
-    user_msg = Message(content=request.message, role="user", session_id=session_id)
-    db_session.add(user_msg)
-    db_session.commit()
+    save_message(session_id, "user", message)
+    return file, history
 
-    # Invoke Agent
+async def wait_for_index(file: File):
+    """Returns None once the document index is ready, otherwise its pending/failed job"""
+    job = await execution.run_cpu(ingestion_queue.ensure_indexed, file, 0)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + CHAT_INDEX_WAIT_SECONDS
+    # Poll instead of parking a worker thread on the job's event
+    while job is not None and not job.finished.is_set() and loop.time() < deadline:
+        await asyncio.sleep(0.25)
+    if job is None or job.status == STATUS_DONE:
+        return None
+    return job
+
+async def run_question(file: File, message: str, callbacks=None, history: str = ""):
+    """
+    Run the pandas agent or the RAG chain; returns (response, cacheable,
+    used_history)
+    """
+    config = {"callbacks": callbacks} if callbacks else None
+    streaming = bool(callbacks)
     try:
         if file.filename.endswith((".csv", ".xlsx", ".xls")):
-            agent = get_agent(file.filepath)
-            response_text = agent.invoke(request.message)["output"]
+            # Simple aggregations are answered straight from the DataFrame
+            fast = await execution.run_cpu(query_engine.answer, file.filepath, file.id, message)
+            if fast is not None:
+                return fast, True, False
+
+            # Loading the frame is CPU work; the agent's LLM calls are awaited
+            # and its sync tools run on the loop's default (tool) executor
+            agent = await execution.run_cpu(
+                get_agent, file.filepath, file.id, file.content_hash, streaming=streaming
+            )
+            try:
+                result = await agent.ainvoke(with_history(message, history), config=config)
+            finally:
+                release_agent(agent)
+            agent_stats.record(result)
+            # A run cut off by the iteration/time limit is not an answer to reuse
+            return result["output"], not stopped_early(result), bool(history)
+
+        # RAG flow: documents are indexed by the background queue, so
+        # wait briefly for a pending job rather than ingesting inline
+        job = await wait_for_index(file)
+        if job is not None and job.status == STATUS_FAILED:
+            return f"Indexing '{file.filename}' failed: {job.error}. Please re-upload the file.", False, False
+        if job is not None:
+            progress = f" ({job.done} chunks so far)" if job.done else ""
+            return (
+                f"'{file.filename}' is still being indexed{progress}. "
+                "Please ask again in a moment."
+            ), False, False
+
+        from ..rag_pipeline import RagPipeline
+        rag = RagPipeline(file.filepath, str(file.id))
+        chain = await execution.run_cpu(rag.get_chain, streaming=streaming)
+        if history:
+            # Retrieve on the bare question (the embedding model truncates long
+            # inputs); the conversation only goes into the LLM prompt
+            documents = await chain.retriever.ainvoke(message, config=config)
+            res = await chain.combine_documents_chain.ainvoke(
+                {"input_documents": documents, "question": with_history(message, history)},
+                config=config,
+            )
+            res = {"result": res["output_text"], "source_documents": documents}
         else:
-            # RAG flow
-            from ..rag_pipeline import RagPipeline
-            rag = RagPipeline(file.filepath, str(file.id))
-            chain = rag.get_chain()
-            res = chain.invoke(request.message)
-            response_text = res["result"]
-            
-            # Append citations if available
-            if res.get("source_documents"):
-                response_text += "\n\n**Sources:**\n"
-                for doc in res["source_documents"]:
-                    page = doc.metadata.get("page", "N/A")
-                    src = doc.metadata.get("source", "N/A")
-                    response_text += f"- Page {page} ({src})\n"
+            res = await chain.ainvoke(message, config=config)
+        response_text = res["result"]
+        
+        # Append citations if available
+        if res.get("source_documents"):
+            response_text += "\n\n**Sources:**\n"
+            for doc in res["source_documents"]:
+                page = doc.metadata.get("page", "N/A")
+                src = doc.metadata.get("source", "N/A")
+                response_text += f"- Page {page} ({src})\n"
+        return response_text, True, bool(history)
 
     except Exception as e:
-        response_text = f"Error processing request: {str(e)}"
+        return f"Error processing request: {str(e)}", False, False
+
+async def answer_question(file: File, message: str, callbacks=None, history: str = "") -> dict:
+    """
+    Answer one question about a file, serving repeats of a question on the
+    same file content from the response cache. Returns the response text and
+    which cache (if any) it came from.
+    """
+    content_hash = file.content_hash or await execution.run_cpu(hash_file, file.filepath)
+    # Standalone answers (fast path, or asked without history) serve any
+    # session; answers that used the conversation only serve the same history
+    contexts = ("", context_digest(history)) if history else ("",)
+    cached = await execution.run_cpu(response_cache.get, content_hash, message, contexts)
+    if cached:
+        response_text, kind = cached
+        return {"response": response_text, "cached": True, "cache": kind}
 
-    # Save Assistant Message
-    assistant_msg = Message(content=response_text, role="assistant", session_id=session_id)
-    db_session.add(assistant_msg)
-    db_session.commit()
+    response_text, cacheable, used_history = await run_question(file, message, callbacks, history)
+    if cacheable:
+        context = context_digest(history) if used_history else ""
+        await execution.run_cpu(response_cache.put, content_hash, message, response_text, context)
+    return {"response": response_text, "cached": False, "cache": None}
+
+@router.post("/message/{session_id}")
+async def send_message(
+    session_id: int,
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+):
+    # Bounded per user and overall; excess requests get 429 + Retry-After
+    async with execution.slot("llm", current_user.id):
+        file, history = await execution.run_crud(start_turn, session_id, request.message, current_user)
+
+        # Invoke Agent
+        answer = await answer_question(file, request.message, history=history)
+
+        # Save Assistant Message
+        await execution.run_crud(save_message, session_id, "assistant", answer["response"])
+    conversation_memory.schedule_compaction(session_id)
     
-    return {"response": response_text}
+    return answer
+
+@router.post("/message/{session_id}/stream")
+async def stream_message(
+    session_id: int,
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Same as /message/{session_id}, but answers as server-sent events:
+    `token` and `step`/`observation` events while the agent or chain runs,
+    then one `done` event with the full response (and cache metadata) once
+    it is saved.
+    """
+    # Admit before the stream starts so overload is still a plain 429
+    ticket = execution.admit("llm", current_user.id)
+    try:
+        file, history = await execution.run_crud(start_turn, session_id, request.message, current_user)
+    except Exception:
+        ticket.release()
+        raise
+
+    handler = QueueCallbackHandler()
+    result = {}
+
+    async def run():
+        try:
+            await ticket.acquire()
+            result.update(await answer_question(file, request.message, callbacks=[handler], history=history))
+        except Exception as e:
+            result["response"] = f"Error processing request: {str(e)}"
+        finally:
+            ticket.release()
+        try:
+            # Save Assistant Message, even if the client went away
+            result["message_id"] = await execution.run_crud(
+                save_message, session_id, "assistant", result["response"]
+            )
+            conversation_memory.schedule_compaction(session_id)
+        finally:
+            handler.close()
+
+    task = asyncio.create_task(run())
+
+    async def events():
+        async for frame in handler.events():
+            yield frame
+        await task
+        yield sse_event("done", result)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/build-dashboard")
-def build_dashboard(
+async def build_dashboard(
     current_user: User = Depends(get_current_user),
-    db_session: Session = Depends(get_session)
 ):
     """Analyze all user files and build an intelligent dashboard"""
+    async with execution.slot("cpu", current_user.id):
+        return await execution.run_cpu(build_dashboard_data, current_user.id)
+
+def build_dashboard_data(user_id: int):
+    # Runs on the CPU pool; SQLAlchemy sessions must not cross threads
+    with Session(engine) as db_session:
+        return dashboard_for_user(user_id, db_session)
+
+def dashboard_for_user(user_id: int, db_session: Session):
     
     # Get all user files
-    statement = select(File).where(File.owner_id == current_user.id)
+    statement = select(File).where(File.owner_id == user_id)
     files = db_session.exec(statement).all()
     
     if not files:
@@ -137,6 +369,8 @@ def build_dashboard(
     }
     
     try:
+        total_rows = 0
+
         # Analyze each CSV/Excel file
         for file in files:
             if not os.path.exists(file.filepath):
@@ -144,135 +378,92 @@ def build_dashboard(
                 
             if file.filepath.endswith(('.csv', '.xlsx', '.xls')):
                 try:
-                    # Read data
-                    if file.filepath.endswith('.csv'):
-                        df = pd.read_csv(file.filepath)
-                    else:
-                        df = pd.read_excel(file.filepath)
+                    # One profiling pass per file content; unchanged files are
+                    # served from the stored profile without touching the data
+                    if not file.content_hash:
+                        file.content_hash = hash_file(file.filepath)
+                        db_session.add(file)
+                        db_session.commit()
+                    profile = get_profile(file.filepath, file.content_hash)
+                    total_rows += profile["rows"]
                     
                     # Basic statistics
                     file_stats = {
                         "filename": file.filename,
-                        "rows": len(df),
-                        "columns": len(df.columns),
-                        "numeric_cols": df.select_dtypes(include=['number']).columns.tolist(),
-                        "categorical_cols": df.select_dtypes(include=['object']).columns.tolist(),
+                        "rows": profile["rows"],
+                        "columns": profile["columns"],
+                        "numeric_cols": profile["numeric_cols"],
+                        "categorical_cols": profile["categorical_cols"],
                     }
+                    numeric_stats = profile["numeric"]
                     
                     # Generate KPIs
                     kpis = []
-                    for col in df.select_dtypes(include=['number']).columns[:4]:
+                    for col in file_stats['numeric_cols'][:4]:
                         kpis.append({
                             "title": f"Total {col}",
-                            "value": float(df[col].sum()),
+                            "value": numeric_stats[col]["sum"],
                             "format": "number"
                         })
                         kpis.append({
                             "title": f"Avg {col}",
-                            "value": float(df[col].mean()),
+                            "value": numeric_stats[col]["mean"],
                             "format": "decimal"
                         })
                     
-                    # Suggest charts
+                    # Suggest charts; unchanged charts reuse their cached image,
+                    # new ones render in the background and the image URLs
+                    # resolve once each one is written
                     charts = []
                     
                     # Bar chart for categorical vs numeric
-                    if len(file_stats['categorical_cols']) > 0 and len(file_stats['numeric_cols']) > 0:
-                        cat_col = file_stats['categorical_cols'][0]
-                        num_col = file_stats['numeric_cols'][0]
-                        
-                        if len(df[cat_col].unique()) <= 20:
-                            # Generate matplotlib plot
-                            import matplotlib.pyplot as plt
-                            import seaborn as sns
-                            import uuid
-                            
-                            plt.figure(figsize=(10, 6))
-                            chart_data = df.groupby(cat_col)[num_col].sum().sort_values(ascending=False).head(10)
-                            
-                            colors = sns.color_palette("viridis", len(chart_data))
-                            bars = plt.bar(range(len(chart_data)), chart_data.values, color=colors)
-                            plt.xticks(range(len(chart_data)), chart_data.index, rotation=45, ha='right')
-                            plt.xlabel(cat_col, fontsize=12, fontweight='bold')
-                            plt.ylabel(num_col, fontsize=12, fontweight='bold')
-                            plt.title(f"{num_col} by {cat_col}", fontsize=14, fontweight='bold', pad=20)
-                            plt.tight_layout()
-                            
-                            # Add value labels on bars
-                            for bar in bars:
-                                height = bar.get_height()
-                                plt.text(bar.get_x() + bar.get_width()/2., height,
-                                        f'{height:,.0f}',
-                                        ha='center', va='bottom', fontsize=9)
-                            
-                            plot_id = str(uuid.uuid4())
-                            plot_path = f"static/plots/{plot_id}.png"
-                            plt.savefig(plot_path, dpi=150, bbox_inches='tight', facecolor='white')
-                            plt.close()
-                            
-                            charts.append({
-                                "type": "bar",
-                                "title": f"{num_col} by {cat_col}",
-                                "image": f"http://localhost:8000/{plot_path}",
-                                "xLabel": cat_col,
-                                "yLabel": num_col
-                            })
+                    bar = profile["charts"]["bar"]
+                    if bar:
+                        cat_col, num_col = bar["x"], bar["y"]
+                        plot_name = plot_cache.get_or_render(file.content_hash, {
+                            "type": "bar",
+                            "title": f"{num_col} by {cat_col}",
+                            "labels": bar["labels"],
+                            "values": bar["values"],
+                            "x_label": cat_col,
+                            "y_label": num_col,
+                        })
+                        charts.append({
+                            "type": "bar",
+                            "title": f"{num_col} by {cat_col}",
+                            "image": plot_url(plot_name),
+                            "xLabel": cat_col,
+                            "yLabel": num_col
+                        })
                     
                     # Pie chart for categorical distribution
-                    if len(file_stats['categorical_cols']) > 0:
-                        cat_col = file_stats['categorical_cols'][0]
-                        if len(df[cat_col].unique()) <= 10:
-                            import matplotlib.pyplot as plt
-                            import uuid
-                            
-                            plt.figure(figsize=(8, 8))
-                            dist = df[cat_col].value_counts().head(8)
-                            
-                            colors = plt.cm.Set3(range(len(dist)))
-                            plt.pie(dist.values, labels=dist.index, autopct='%1.1f%%', 
-                                   startangle=90, colors=colors, textprops={'fontsize': 10})
-                            plt.title(f"Distribution of {cat_col}", fontsize=14, fontweight='bold', pad=20)
-                            plt.axis('equal')
-                            
-                            plot_id = str(uuid.uuid4())
-                            plot_path = f"static/plots/{plot_id}.png"
-                            plt.savefig(plot_path, dpi=150, bbox_inches='tight', facecolor='white')
-                            plt.close()
-                            
-                            charts.append({
-                                "type": "pie",
-                                "title": f"Distribution of {cat_col}",
-                                "image": f"http://localhost:8000/{plot_path}"
-                            })
+                    pie = profile["charts"]["pie"]
+                    if pie:
+                        cat_col = pie["column"]
+                        plot_name = plot_cache.get_or_render(file.content_hash, {
+                            "type": "pie",
+                            "title": f"Distribution of {cat_col}",
+                            "labels": pie["labels"],
+                            "values": pie["values"],
+                        })
+                        charts.append({
+                            "type": "pie",
+                            "title": f"Distribution of {cat_col}",
+                            "image": plot_url(plot_name)
+                        })
                     
                     # Line chart for trends (if numeric data)
-                    if len(file_stats['numeric_cols']) >= 1:
-                        import matplotlib.pyplot as plt
-                        import seaborn as sns
-                        import uuid
-                        
-                        plt.figure(figsize=(12, 6))
-                        
-                        for idx, col in enumerate(file_stats['numeric_cols'][:3]):
-                            plt.plot(df[col].head(50).values, marker='o', linewidth=2, 
-                                   markersize=4, label=col)
-                        
-                        plt.xlabel("Index", fontsize=12, fontweight='bold')
-                        plt.ylabel("Value", fontsize=12, fontweight='bold')
-                        plt.title("Trend Analysis", fontsize=14, fontweight='bold', pad=20)
-                        plt.legend(loc='best', fontsize=10)
-                        plt.grid(True, alpha=0.3)
-                        plt.tight_layout()
-                        
-                        plot_id = str(uuid.uuid4())
-                        plot_path = f"static/plots/{plot_id}.png"
-                        plt.savefig(plot_path, dpi=150, bbox_inches='tight', facecolor='white')
-                        plt.close()
-                        
+                    line = profile["charts"]["line"]
+                    if line:
+                        plot_name = plot_cache.get_or_render(file.content_hash, {
+                            "type": "line",
+                            "title": "Trend Analysis",
+                            "series": {col: {"y": values} for col, values in line["series"].items()},
+                        })
                         charts.append({
                             "type": "line",
                             "title": "Trend Analysis",
-                            "image": f"http://localhost:8000/{plot_path}"
+                            "image": plot_url(plot_name)
                         })
                     
                     dashboard_data["charts"].extend(charts[:6])  # Max 6 charts per file
@@ -280,18 +471,20 @@ def build_dashboard(
                     
                     # Generate statistical insights (no LLM needed)
                     insights_text = f"📊 **Data Summary for {file.filename}**\n\n"
-                    insights_text += f"• Total records: {len(df):,}\n"
-                    insights_text += f"• Number of columns: {len(df.columns)}\n"
+                    insights_text += f"• Total records: {profile['rows']:,}\n"
+                    insights_text += f"• Number of columns: {profile['columns']}\n"
                     
                     # Numeric insights
                     for col in file_stats['numeric_cols'][:3]:
-                        insights_text += f"• {col}: Min={df[col].min():,.2f}, Max={df[col].max():,.2f}, Avg={df[col].mean():,.2f}\n"
+                        stats = numeric_stats[col]
+                        if stats["count"]:
+                            insights_text += f"• {col}: Min={stats['min']:,.2f}, Max={stats['max']:,.2f}, Avg={stats['mean']:,.2f}\n"
                     
                     # Categorical insights
                     for col in file_stats['categorical_cols'][:2]:
-                        top_val = df[col].value_counts().head(1)
+                        top_val = profile["categorical"][col]["top"][:1]
                         if len(top_val) > 0:
-                            insights_text += f"• Top {col}: {top_val.index[0]} ({top_val.values[0]:,} records)\n"
+                            insights_text += f"• Top {col}: {top_val[0][0]} ({top_val[0][1]:,} records)\n"
                     
                     dashboard_data["insights"].append({
                         "file": file.filename,
@@ -302,19 +495,6 @@ def build_dashboard(
                     print(f"Error analyzing {file.filename}: {str(e)}")
                     continue
         
-        # Calculate summary totals
-        total_rows = 0
-        for file_obj in files:
-            if file_obj.filepath.endswith(('.csv', '.xlsx', '.xls')) and os.path.exists(file_obj.filepath):
-                try:
-                    if file_obj.filepath.endswith('.csv'):
-                        df = pd.read_csv(file_obj.filepath)
-                    else:
-                        df = pd.read_excel(file_obj.filepath)
-                    total_rows += len(df)
-                except:
-                    pass
-        
         dashboard_data["summary"] = {
             "total_files": len(files),
             "total_rows": total_rows,
@@ -326,3 +506,21 @@ def build_dashboard(
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error building dashboard: {str(e)}")
+
+
+@router.get("/plots/{plot_name}")
+async def get_plot(plot_name: str):
+    """Serve a dashboard chart, waiting for it if it is still rendering"""
+    if not PLOT_NAME_RE.match(plot_name):
+        raise HTTPException(status_code=404, detail="Plot not found")
+
+    future = chart_renderer.pending(plot_name)
+    if future is not None:
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), PLOT_WAIT_SECONDS)
+        except Exception:
+            pass
+    plot_path = os.path.join(STATIC_DIR, plot_name)
+    if not os.path.exists(plot_path):
+        raise HTTPException(status_code=404, detail="Plot not found")
+    return FileResponse(plot_path, media_type="image/png")
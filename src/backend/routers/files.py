@@ -1,19 +1,44 @@
-import shutil
+import hashlib
 import os
-from typing import List
-from fastapi import APIRouter, Depends, UploadFile, File as FastAPIFile, HTTPException
-from sqlmodel import Session, select
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, UploadFile, File as FastAPIFile, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlmodel import Session, col, select
 from ..database import get_session
 from ..models import User, File, ChatSession
 from ..dependencies import get_current_user
+from ..data_cache import dataframe_cache
+from ..columnar import TABULAR_EXTENSIONS, convert_to_sidecar, remove_sidecar
+from ..ingestion import DOCUMENT_EXTENSIONS, STATUS_DONE, ingestion_queue
+from ..response_cache import response_cache
+from ..profiling import precompute_profile, remove_profile
+from ..vector_registry import vector_registry
+from ..pagination import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, keyset_page, page_limit
 
 router = APIRouter(prefix="/files", tags=["files"])
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+def release_profile(session: Session, content_hash: str, file_id: int):
+    """Delete a content hash's profile unless another upload still has that content"""
+    statement = select(File.id).where(File.content_hash == content_hash, File.id != file_id)
+    if content_hash and session.exec(statement.limit(1)).first() is None:
+        remove_profile(content_hash)
+
+class FileItemResponse(BaseModel):
+    id: int
+    filename: str
+    upload_date: datetime
+    index_status: Optional[str]
+
+    class Config:
+        from_attributes = True
+
 @router.post("/", response_model=File)
 def upload_file(
+    background_tasks: BackgroundTasks,
     file: UploadFile = FastAPIFile(...),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
@@ -28,29 +53,97 @@ def upload_file(
     
     file_location = os.path.join(user_dir, file.filename)
     
-    # Save file
+    # Save file, hashing the content as it streams to disk
+    digest = hashlib.sha256()
     with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Save to DB
-    db_file = File(
-        filename=file.filename,
-        filepath=file_location,
-        owner_id=current_user.id
+        for block in iter(lambda: file.file.read(1024 * 1024), b""):
+            digest.update(block)
+            buffer.write(block)
+
+    # Drop cached frames and the now-stale columnar copy of the old content
+    dataframe_cache.invalidate(filepath=file_location)
+    remove_sidecar(file_location)
+    content_hash = digest.hexdigest()
+
+    # Re-uploading a file name replaces the existing record, so the file id,
+    # its chat sessions and its vector collection carry over
+    statement = (
+        select(File)
+        .where(File.owner_id == current_user.id, File.filepath == file_location)
+        .order_by(File.id.desc())
     )
+    db_file = session.exec(statement).first()
+    unchanged = db_file is not None and db_file.content_hash == content_hash
+    if db_file and not unchanged:
+        # Answers about the previous content no longer apply
+        response_cache.invalidate(db_file.content_hash)
+        release_profile(session, db_file.content_hash, db_file.id)
+    if db_file:
+        db_file.content_hash = content_hash
+        db_file.sidecar_path = None
+        db_file.upload_date = datetime.utcnow()
+    else:
+        # Save to DB
+        db_file = File(
+            filename=file.filename,
+            filepath=file_location,
+            content_hash=content_hash,
+            owner_id=current_user.id
+        )
     session.add(db_file)
     session.commit()
     session.refresh(db_file)
+
+    # Convert tabular uploads to a Parquet sidecar after the response is sent
+    if file.filename.endswith(TABULAR_EXTENSIONS):
+        background_tasks.add_task(convert_to_sidecar, db_file.id)
+        # Profile once per content so the agent prompt starts with the schema
+        background_tasks.add_task(precompute_profile, db_file.filepath, content_hash)
+    # Documents are chunked and embedded by the ingestion workers
+    # (re-uploads only re-embed the chunks that changed)
+    elif file.filename.endswith(DOCUMENT_EXTENSIONS):
+        if not (unchanged and db_file.index_status == STATUS_DONE):
+            ingestion_queue.submit(db_file.id, db_file.filepath)
+            session.refresh(db_file)
     return db_file
 
-@router.get("/", response_model=List[File])
+@router.get("/", response_model=List[FileItemResponse])
 def list_files(
+    response: Response,
+    limit: Optional[int] = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    before: Optional[int] = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
-    statement = select(File).where(File.owner_id == current_user.id)
-    results = session.exec(statement)
-    return results.all()
+    """The user's newest files, oldest first; older pages via ?before=<X-Next-Cursor>"""
+    statement = (
+        select(File.id, File.filename, File.upload_date, File.index_status)
+        .where(File.owner_id == current_user.id)
+    )
+    if before is not None:
+        statement = statement.where(File.id < before)
+    rows = session.exec(page_limit(statement.order_by(col(File.id).desc()), limit)).all()
+    return keyset_page(rows, limit, response)
+
+@router.get("/{file_id}/status")
+def get_file_status(
+    file_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    """Indexing progress for a document upload"""
+    file = session.get(File, file_id)
+    if not file or file.owner_id != current_user.id:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    job = ingestion_queue.get(file.id)
+    if job:
+        return job.to_dict()
+    return {
+        "file_id": file.id,
+        "status": file.index_status,
+        "error": file.index_error,
+    }
 
 @router.delete("/{file_id}")
 def delete_file(
@@ -61,6 +154,10 @@ def delete_file(
     file = session.get(File, file_id)
     if not file or file.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="File not found")
+
+    # Stop indexing first, so nothing writes to the collection removed below
+    if not ingestion_queue.cancel(file.id):
+        print(f"Indexing of file {file.id} is still stopping; it removes its collection when done")
         
     # Remove from FS
     if os.path.exists(file.filepath):
@@ -68,6 +165,13 @@ def delete_file(
             os.remove(file.filepath)
         except OSError:
             pass # Log error
+    remove_sidecar(file.filepath)
+
+    dataframe_cache.invalidate(file_id=file.id, filepath=file.filepath)
+    # Close the open collection and remove vector_store/collection_<id>
+    vector_registry.remove(file.id)
+    response_cache.invalidate(file.content_hash)
+    release_profile(session, file.content_hash, file.id)
             
     session.delete(file)
     session.commit()
@@ -0,0 +1,371 @@
+# Agent-written pandas code runs in pre-started worker processes instead of
+# the API process: each worker has CPU-time and address-space rlimits, every
+# call has a wall-clock timeout, and workers are replaced after a crash,
+# timeout or a fixed number of calls. Workers keep parsed DataFrames between
+# calls, so a warm worker answers without re-importing or re-loading anything.
+# Like python_repl_ast, variables persist between the steps of one agent run:
+# each run keeps its namespace in one worker, and its steps go to that worker.
+import ast
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; run without rlimits
+    resource = None
+
+SANDBOX_ENABLED = os.getenv("SANDBOX_ENABLED", "true").lower() in ("1", "true", "yes")
+# With the sandbox off, agent code would run inside the API process; that is
+# only allowed when this is set too (local development)
+ALLOW_UNSANDBOXED_CODE = os.getenv("ALLOW_UNSANDBOXED_CODE", "false").lower() in ("1", "true", "yes")
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "30"))
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", "30"))
+# Address-space limit per worker (0 disables); includes the cached frames
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "4096"))
+# Parsed frames each worker caches; a quarter of its memory limit by default,
+# leaving room for the copies and intermediates the agent's code creates
+SANDBOX_FRAME_CACHE_MB = int(os.getenv(
+    "SANDBOX_FRAME_CACHE_MB", str(SANDBOX_MEMORY_MB // 4 if SANDBOX_MEMORY_MB > 0 else 1024)
+))
+SANDBOX_FRAME_CACHE_ENTRIES = 4
+SANDBOX_MAX_CALLS = int(os.getenv("SANDBOX_MAX_CALLS", "200"))
+# How long a call waits for a free worker
+SANDBOX_WAIT_SECONDS = float(os.getenv("SANDBOX_WAIT_SECONDS", "30"))
+SANDBOX_MAX_OUTPUT_CHARS = 10000
+# Run namespaces a worker keeps for runs that never signalled their end
+SANDBOX_MAX_NAMESPACES = int(os.getenv("SANDBOX_MAX_NAMESPACES", "8"))
+
+
+def _apply_memory_limit(memory_mb: int):
+    if resource is None or memory_mb <= 0:
+        return
+    limit = memory_mb * 1024 * 1024
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _apply_cpu_limit(cpu_seconds: int):
+    """Allow this call cpu_seconds more CPU time; past that the kernel kills the worker"""
+    if resource is None or cpu_seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _sanitize(code: str) -> str:
+    # Same clean-up as the stock python_repl_ast tool: strip ``` fences
+    from langchain_experimental.tools.python.tool import sanitize_input
+    return sanitize_input(code)
+
+
+def _execute(code: str, namespace: dict) -> str:
+    """Run code like python_repl_ast: exec all statements, evaluate the last one"""
+    from contextlib import redirect_stdout
+    from io import StringIO
+
+    try:
+        tree = ast.parse(_sanitize(code))
+        exec(ast.unparse(ast.Module(tree.body[:-1], type_ignores=[])), namespace)
+        last = ast.unparse(ast.Module(tree.body[-1:], type_ignores=[]))
+        buffer = StringIO()
+        try:
+            with redirect_stdout(buffer):
+                value = eval(last, namespace)
+            output = buffer.getvalue() if value is None else str(value)
+        except Exception:
+            with redirect_stdout(buffer):
+                exec(last, namespace)
+            output = buffer.getvalue()
+    except MemoryError:
+        raise
+    except Exception as e:
+        output = "{}: {}".format(type(e).__name__, str(e))
+    return output[:SANDBOX_MAX_OUTPUT_CHARS]
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int):
+    """
+    Worker loop: receive (filepath, file_id, code, run token, ended run
+    tokens), send back (output, recycle)
+    """
+    _apply_memory_limit(memory_mb)
+    # Pay the heavy imports once, before the first call
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    import pandas as pd
+    from .data_cache import dataframe_cache, load_dataframe
+
+    # The API process's cache budget would not fit under the worker's rlimit
+    dataframe_cache.max_bytes = SANDBOX_FRAME_CACHE_MB * 1024 * 1024
+    dataframe_cache.max_entries = SANDBOX_FRAME_CACHE_ENTRIES
+
+    namespaces = OrderedDict()  # run token -> globals of that agent run
+    conn.send("ready")
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            return
+        if message is None:
+            return
+        filepath, file_id, code, token, ended = message
+        for old in ended:
+            namespaces.pop(old, None)
+        _apply_cpu_limit(cpu_seconds)
+        try:
+            namespace = namespaces.get(token) if token is not None else None
+            if namespace is None:
+                # Shallow copy so columns added in one run don't leak into the next
+                df = load_dataframe(filepath, file_id if file_id is not None else filepath).copy(deep=False)
+                namespace = {"df": df, "pd": pd, "np": np}
+                if token is not None:
+                    namespaces[token] = namespace
+                    while len(namespaces) > SANDBOX_MAX_NAMESPACES:
+                        namespaces.popitem(last=False)
+            else:
+                namespaces.move_to_end(token)
+            conn.send((_execute(code, namespace), False))
+        except MemoryError:
+            # The heap may be fragmented or half-freed; start a fresh worker
+            conn.send(("MemoryError: the code used more memory than allowed", True))
+        except Exception as e:
+            conn.send(("{}: {}".format(type(e).__name__, str(e)), False))
+
+
+class SandboxWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, SANDBOX_MEMORY_MB, SANDBOX_CPU_SECONDS),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.calls = 0
+        self.ended = set()  # finished runs whose namespaces this worker should drop
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(timeout=1)
+        finally:
+            self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class SandboxPool:
+    """Fixed-size pool of isolated Python workers for agent tool calls"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._context = multiprocessing.get_context("spawn")
+        # LIFO so the most recently used (warmest) worker is picked first
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._affinity = {}  # run token -> worker holding the run's namespace
+        self._started = False
+        self._closed = False
+        self.calls = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.recycled = 0
+        self.exec_seconds_total = 0.0
+
+    def start(self):
+        """Start the workers now so the first question doesn't wait for them"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._closed = False
+        for _ in range(self.size):
+            self._replace()
+
+    def _spawn(self):
+        worker = SandboxWorker(self._context)
+        if not worker.wait_ready(60):
+            worker.kill()
+            raise RuntimeError("Python worker failed to start")
+        return worker
+
+    def _replace(self, old: Optional[SandboxWorker] = None):
+        """Swap a worker out for a fresh one in the background"""
+        if old is not None:
+            old.kill()
+            # Runs on the old worker start over with a fresh namespace
+            with self._lock:
+                for token in [t for t, w in self._affinity.items() if w is old]:
+                    del self._affinity[token]
+
+        def spawn():
+            try:
+                worker = self._spawn()
+            except Exception as e:
+                print(f"Sandbox worker start failed: {str(e)}")
+                return
+            if self._closed:
+                worker.stop()
+            else:
+                self._release(worker)
+
+        threading.Thread(target=spawn, daemon=True).start()
+
+    def _acquire(self, token, timeout: float) -> Optional[SandboxWorker]:
+        """An idle worker; a run that already has a namespace waits for its own"""
+        deadline = time.monotonic() + timeout
+        with self._available:
+            while True:
+                owner = self._affinity.get(token) if token is not None else None
+                if owner is not None and owner in self._idle:
+                    self._idle.remove(owner)
+                    return owner
+                if owner is None and self._idle:
+                    return self._idle.pop()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+
+    def _release(self, worker: SandboxWorker):
+        with self._available:
+            self._idle.append(worker)
+            self._available.notify_all()
+
+    def end_run(self, token: str):
+        """Let the worker holding an agent run's namespace drop it"""
+        with self._lock:
+            worker = self._affinity.pop(token, None)
+            if worker is not None:
+                worker.ended.add(token)
+
+    def run(self, code: str, filepath: str, file_id=None, timeout: float = SANDBOX_TIMEOUT_SECONDS,
+            token: Optional[str] = None) -> str:
+        """
+        Execute code against the file's DataFrame in a worker; returns its
+        output. Calls with the same run token share variables.
+        """
+        self.start()
+        worker = self._acquire(token, SANDBOX_WAIT_SECONDS)
+        if worker is None:
+            return "Error: no Python worker is free right now, please try again"
+
+        start = time.perf_counter()
+        recycle = False
+        with self._lock:
+            ended, worker.ended = list(worker.ended), set()
+        try:
+            worker.conn.send((filepath, file_id, code, token, ended))
+            if not worker.conn.poll(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._replace(worker)
+                return f"TimeoutError: execution took longer than {timeout:g} seconds"
+            output, recycle = worker.conn.recv()
+        except (EOFError, OSError):
+            # Killed by the CPU or memory limit (or crashed)
+            with self._lock:
+                self.crashes += 1
+            self._replace(worker)
+            return "Error: the code exceeded the CPU or memory limit and was stopped"
+
+        worker.calls += 1
+        with self._lock:
+            self.calls += 1
+            self.exec_seconds_total += time.perf_counter() - start
+            if token is not None:
+                self._affinity[token] = worker
+        if recycle or worker.calls >= SANDBOX_MAX_CALLS:
+            with self._lock:
+                self.recycled += 1
+            self._replace(worker)
+        else:
+            self._release(worker)
+        return output
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            self._started = False
+            idle, self._idle = self._idle, []
+            self._affinity.clear()
+        for worker in idle:
+            worker.stop()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": SANDBOX_ENABLED,
+                "workers": self.size,
+                "idle": len(self._idle),
+                "active_runs": len(self._affinity),
+                "calls": self.calls,
+                "timeouts": self.timeouts,
+                "crashes": self.crashes,
+                "recycled": self.recycled,
+                "exec_seconds_avg": self.exec_seconds_total / self.calls if self.calls else 0.0,
+            }
+
+
+sandbox_pool = SandboxPool(SANDBOX_WORKERS)
+
+
+class PythonInputs(BaseModel):
+    query: str = Field(description="code snippet to run")
+
+
+class SandboxedPythonTool(BaseTool):
+    """Drop-in replacement for python_repl_ast that runs code in the sandbox pool"""
+
+    name: str = "python_repl_ast"
+    description: str = (
+        "A Python shell. Use this to execute python commands. "
+        "Input should be a valid python command. "
+        "When using this tool, sometimes output is abbreviated - "
+        "make sure it does not look abbreviated before using it in your answer."
+    )
+    args_schema: Type[BaseModel] = PythonInputs
+    filepath: str
+    file_id: Optional[int] = None
+    # One per agent run: steps of the run share variables, like python_repl_ast
+    run_token: str = Field(default_factory=lambda: uuid.uuid4().hex)
+
+    def _run(self, query: str, run_manager=None) -> str:
+        return sandbox_pool.run(query, self.filepath, self.file_id, token=self.run_token)
+
+    def end_run(self):
+        sandbox_pool.end_run(self.run_token)
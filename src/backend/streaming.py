@@ -0,0 +1,55 @@
+import asyncio
+import json
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Server-sent events for chat answers: callbacks fired while the agent/chain
+# runs (on the event loop or in executor threads) push tokens and
+# intermediate steps onto a queue that the response drains
+SSE_KEEPALIVE_SECONDS = 15
+
+_END = object()
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Forwards LLM tokens and agent steps to an asyncio queue as SSE payloads"""
+
+    # Callbacks only enqueue, so run them inline rather than in an executor
+    run_inline = True
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def _put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._put(("token", {"text": token}))
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        self._put(("step", {"tool": action.tool, "input": action.tool_input}))
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self._put(("observation", {"output": str(output)[:2000]}))
+
+    def close(self):
+        self._put(_END)
+
+    async def events(self):
+        """Yield SSE frames until close() is called, with keepalive comments"""
+        while True:
+            try:
+                item = await asyncio.wait_for(self.queue.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if item is _END:
+                return
+            event, data = item
+            yield sse_event(event, data)
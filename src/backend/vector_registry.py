@@ -0,0 +1,196 @@
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Persistent directory for vector DB
+VECTOR_DB_DIR = "vector_store"
+os.makedirs(VECTOR_DB_DIR, exist_ok=True)
+
+# Memory budget for Chroma collections (and their BM25 indexes) kept open
+# across chat turns
+VECTOR_REGISTRY_MAX_MB = int(os.getenv("VECTOR_REGISTRY_MAX_MB", "512"))
+VECTOR_REGISTRY_MAX_ENTRIES = int(os.getenv("VECTOR_REGISTRY_MAX_ENTRIES", "32"))
+# Rough per-vector overhead of the HNSW graph and SQLite row on top of the floats
+VECTOR_OVERHEAD_BYTES = 512
+POSTING_BYTES = 72
+
+
+def collection_directory(file_id) -> str:
+    return os.path.join(VECTOR_DB_DIR, f"collection_{file_id}")
+
+
+def close_vectorstore(vectorstore):
+    """Release a Chroma client (its SQLite handles stop with the last client)"""
+    client = getattr(vectorstore, "_client", None)
+    close = getattr(client, "close", None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception as e:
+        print(f"Error closing vector store: {str(e)}")
+
+
+def estimate_bytes(vectorstore, keyword_index) -> int:
+    collection = vectorstore._collection
+    count = collection.count()
+    dims = 0
+    if count:
+        sample = collection.get(limit=1, include=["embeddings"])["embeddings"]
+        dims = len(sample[0]) if sample is not None and len(sample) else 0
+    postings = sum(len(p) for p in keyword_index.postings.values()) if keyword_index else 0
+    return count * (dims * 4 + VECTOR_OVERHEAD_BYTES) + postings * POSTING_BYTES
+
+
+class VectorHandle:
+    """
+    An open collection plus its chains. Readers hold lease() while they query
+    it, and closing is deferred until the last lease is returned.
+    """
+
+    def __init__(self, vectorstore, keyword_index, signature, nbytes: int):
+        self.vectorstore = vectorstore
+        self.keyword_index = keyword_index
+        self.signature = signature
+        self.nbytes = nbytes
+        self.chains = {}  # streaming -> RetrievalQA chain
+        self._lock = threading.Lock()
+        self._leases = 0
+        self._closing = False
+
+    @contextmanager
+    def lease(self):
+        with self._lock:
+            self._leases += 1
+        try:
+            yield self.vectorstore
+        finally:
+            with self._lock:
+                self._leases -= 1
+                release = self._closing and self._leases == 0
+            if release:
+                close_vectorstore(self.vectorstore)
+
+    def close(self):
+        self.chains.clear()
+        with self._lock:
+            if self._closing:
+                return
+            self._closing = True
+            release = self._leases == 0
+        if release:
+            close_vectorstore(self.vectorstore)
+
+
+class VectorStoreRegistry:
+    """
+    Process-wide LRU of opened Chroma collections and the RetrievalQA chains
+    built on them, keyed by File.id.
+
+    Entries remember the signature of the index they were opened from (the
+    BM25 index file, rewritten by every ingest), so a re-indexed document is
+    reopened on the next question.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # file_id -> VectorHandle
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.opens = 0
+        self.open_seconds_total = 0.0
+        self.open_seconds_max = 0.0
+
+    def get_chain(self, file_id, signature, streaming: bool, open_store, build_chain):
+        """
+        The cached chain for a file. On a miss the collection is opened with
+        open_store() -> (vectorstore, keyword_index) and the chain built with
+        build_chain(handle, streaming). `signature()` identifies the on-disk
+        index version.
+        """
+        current = signature()
+        with self._lock:
+            handle = self._entries.get(file_id)
+            if handle and handle.signature == current:
+                self._entries.move_to_end(file_id)
+                self.hits += 1
+                chain = handle.chains.get(streaming)
+                if chain is None:
+                    chain = handle.chains[streaming] = build_chain(handle, streaming)
+                return chain
+            self.misses += 1
+
+        # Open outside the lock so other files are not blocked
+        start = time.perf_counter()
+        vectorstore, keyword_index = open_store()
+        nbytes = estimate_bytes(vectorstore, keyword_index)
+        elapsed = time.perf_counter() - start
+
+        # Opening may have (re)built the keyword index, so sign it afterwards
+        handle = VectorHandle(vectorstore, keyword_index, signature(), nbytes)
+        chain = handle.chains[streaming] = build_chain(handle, streaming)
+        with self._lock:
+            self.opens += 1
+            self.open_seconds_total += elapsed
+            self.open_seconds_max = max(self.open_seconds_max, elapsed)
+            self._close(self._entries.pop(file_id, None))
+            self._entries[file_id] = handle
+            self._bytes += nbytes
+            self._evict()
+        return chain
+
+    def _close(self, handle):
+        if handle is None:
+            return
+        self._bytes -= handle.nbytes
+        handle.close()
+
+    def _evict(self):
+        # The newest entry always stays, even over budget: its chain is in use
+        while len(self._entries) > 1 and (
+            self._bytes > self.max_bytes or len(self._entries) > self.max_entries
+        ):
+            _, handle = self._entries.popitem(last=False)
+            self._close(handle)
+            self.evictions += 1
+
+    def close(self, file_id):
+        """Drop a file's open collection and chains"""
+        with self._lock:
+            self._close(self._entries.pop(file_id, None))
+
+    def remove(self, file_id):
+        """Close a file's collection and delete it from disk"""
+        self.close(file_id)
+        shutil.rmtree(collection_directory(file_id), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                self._close(self._entries.popitem()[1])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "open_handles": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "open_seconds_avg": self.open_seconds_total / self.opens if self.opens else 0.0,
+                "open_seconds_max": self.open_seconds_max,
+            }
+
+
+vector_registry = VectorStoreRegistry(
+    max_bytes=VECTOR_REGISTRY_MAX_MB * 1024 * 1024,
+    max_entries=VECTOR_REGISTRY_MAX_ENTRIES,
+)
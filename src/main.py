@@ -1,3 +1,4 @@
+import os
 import pandas as pd
 import streamlit as st
 try:
@@ -13,6 +14,10 @@ try:
     from langchain_ollama import ChatOllama
 except Exception:
     ChatOllama = None
+try:
+    from backend.data_cache import read_working_frame
+except Exception:
+    read_working_frame = None
 
 
 # Streamlit Web Configuration
@@ -25,11 +30,28 @@ st.set_page_config(
 
 
 # Read the data file
+# Streamlit re-runs this script on every chat turn, so the parse is cached per
+# upload. The key is the upload's id, not its bytes, and the file is spilled to
+# disk so the backend can stream large CSVs and sample them like the API does.
+@st.cache_data(show_spinner=False)
+def _parse_upload(name, file_id, size, _upload):
+    import shutil
+    import tempfile
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(name)[1], delete=False) as f:
+        _upload.seek(0)
+        shutil.copyfileobj(_upload, f)
+    try:
+        if read_working_frame is not None:
+            # Compact dtypes; a row sample of CSVs above OUT_OF_CORE_THRESHOLD_MB
+            return read_working_frame(f.name)
+        if name.endswith(".csv"):
+            return pd.read_csv(f.name), None
+        return pd.read_excel(f.name), None
+    finally:
+        os.remove(f.name)
+
 def read_data(file):
-    if file.name.endswith(".csv"):
-        return pd.read_csv(file)
-    else:
-        return pd.read_excel(file)
+    return _parse_upload(file.name, file.file_id, file.size, file)
     
 
 # Streamlit page title
@@ -49,9 +71,13 @@ if "df" not in st.session_state:
 uploaded_file = st.file_uploader("Select a file...", type=["csv","xlsx","xls"])
 
 if uploaded_file:
-    st.session_state.df = read_data(uploaded_file)
+    st.session_state.df, memory = read_data(uploaded_file)
     st.write("Dataframe Preview: ")
     st.dataframe(st.session_state.df.head())
+    if memory:
+        st.caption(
+            f"Memory: {memory['bytes_before'] / 1e6:,.1f} MB -> {memory['bytes_after'] / 1e6:,.1f} MB"
+        )
     
 
 # Display chat history
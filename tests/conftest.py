@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The backend package lives under src/ and is not installed
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
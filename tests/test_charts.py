@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.charts import build_chart, lttb_indices, parse_chart_request
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[500] = 100.0
+    indices = lttb_indices(x, y, 20)
+    assert len(indices) == 20
+    assert indices[0] == 0 and indices[-1] == 999
+    assert 500 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_short_series_untouched():
+    x = np.arange(10, dtype=float)
+    assert lttb_indices(x, x, 20).tolist() == list(range(10))
+    assert lttb_indices(x, x, 2).tolist() == list(range(10))
+
+
+def test_parse_chart_request():
+    request = parse_chart_request('```json\n{"type": "bar", "x": "region", "y": "sales", "agg": "avg"}\n```')
+    assert request["type"] == "bar" and request["agg"] == "mean" and request["limit"] == 20
+    assert parse_chart_request("{'type': 'line', 'y': ['a', 'b']}")["y"] == ["a", "b"]
+
+
+@pytest.mark.parametrize("text", ['{"type": "code", "x": "a"}', '{"type": "bar", "agg": "mode"}', "[1, 2]", "bar chart"])
+def test_parse_chart_request_rejects(text):
+    with pytest.raises(ValueError):
+        parse_chart_request(text)
+
+
+def test_bar_chart_aggregates_and_limits():
+    df = pd.DataFrame({"region": list("abcabca"), "sales": [1, 2, 3, 4, 5, 6, 7]})
+    spec = build_chart(df, parse_chart_request('{"type": "bar", "x": "region", "y": "sales", "limit": 2}'))
+    assert spec["labels"] == ["a", "c"]
+    assert spec["values"] == [12.0, 9.0]
+
+
+def test_line_chart_is_downsampled():
+    df = pd.DataFrame({"t": np.arange(5000), "v": np.sin(np.arange(5000) / 50)})
+    spec = build_chart(df, parse_chart_request('{"type": "line", "x": "t", "y": "v"}'))
+    assert len(spec["series"]["v"]["x"]) == 1000
+
+
+def test_unknown_column_is_reported():
+    df = pd.DataFrame({"region": ["a"], "sales": [1]})
+    with pytest.raises(ValueError, match="unknown column 'price'"):
+        build_chart(df, parse_chart_request('{"type": "scatter", "x": "sales", "y": "price"}'))
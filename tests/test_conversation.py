@@ -0,0 +1,110 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend import rag_pipeline
+from backend.conversation import ConversationMemory, split_window, with_history
+from backend.models import File, Message
+from backend.response_cache import ResponseCache, context_digest
+from backend.routers import chat
+
+
+def messages(*contents):
+    return [Message(id=i, session_id=1, role="user" if i % 2 == 0 else "assistant", content=c)
+            for i, c in enumerate(contents)]
+
+
+def test_split_window_keeps_newest_within_budget():
+    history = messages("one " * 20, "two " * 20, "three", "four")
+    older, recent = split_window(history, 10)
+    assert [m.content for m in recent] == ["three", "four"]
+    assert len(older) == 2
+    assert split_window(history, 0) == (history, [])
+
+
+def test_with_history():
+    assert with_history("total sales", "") == "total sales"
+    prompt = with_history("and by region?", "User: total sales")
+    assert "User: total sales" in prompt
+    assert prompt.endswith("New question: and by region?")
+
+
+def test_summary_falls_back_to_questions(monkeypatch):
+    def generate(*args, **kwargs):
+        raise RuntimeError("unreachable")
+
+    from backend import llm
+    monkeypatch.setattr(llm.inference_client, "generate", generate)
+    memory = ConversationMemory(enabled=True, window_tokens=10, summary_tokens=50)
+    summary = memory._summarize("", messages("total sales?", "42", "by region?"))
+    assert summary == "total sales?; by region?"
+    assert memory.summary_failures == 1
+    memory.shutdown()
+
+
+def _file():
+    return File(id=1, filename="report.pdf", filepath="report.pdf", content_hash="hash", owner_id=1)
+
+
+def test_history_answers_only_serve_the_same_history(monkeypatch):
+    monkeypatch.setattr(chat, "response_cache", ResponseCache(60, 10, False, 0.9))
+    calls = []
+
+    async def run_question(file, message, callbacks=None, history=""):
+        calls.append(history)
+        return f"answer {len(calls)}", True, bool(history)
+
+    monkeypatch.setattr(chat, "run_question", run_question)
+    first = asyncio.run(chat.answer_question(_file(), "and by region?", history="User: total sales"))
+    again = asyncio.run(chat.answer_question(_file(), "and by region?", history="User: total sales"))
+    other = asyncio.run(chat.answer_question(_file(), "and by region?", history="User: total cost"))
+    assert not first["cached"] and again["cached"] and not other["cached"]
+    assert context_digest("") == ""
+
+
+def test_standalone_answers_serve_any_history(monkeypatch):
+    monkeypatch.setattr(chat, "response_cache", ResponseCache(60, 10, False, 0.9))
+
+    async def run_question(file, message, callbacks=None, history=""):
+        return "42", True, False
+
+    monkeypatch.setattr(chat, "run_question", run_question)
+    asyncio.run(chat.answer_question(_file(), "total sales"))
+    follow_up = asyncio.run(chat.answer_question(_file(), "total sales", history="User: hello"))
+    assert follow_up["cached"]
+
+
+def test_rag_retrieves_on_the_bare_question(monkeypatch):
+    seen = {}
+
+    async def wait_for_index(file):
+        return None
+
+    async def retrieve(query, config=None):
+        seen["query"] = query
+        return []
+
+    async def combine(inputs, config=None):
+        seen["prompt"] = inputs["question"]
+        return {"output_text": "by region: 10"}
+
+    chain = SimpleNamespace(
+        retriever=SimpleNamespace(ainvoke=retrieve),
+        combine_documents_chain=SimpleNamespace(ainvoke=combine),
+    )
+
+    class Pipeline:
+        def __init__(self, filepath, collection):
+            pass
+
+        def get_chain(self, streaming=False):
+            return chain
+
+    monkeypatch.setattr(chat, "wait_for_index", wait_for_index)
+    monkeypatch.setattr(rag_pipeline, "RagPipeline", Pipeline)
+    response, cacheable, used_history = asyncio.run(
+        chat.run_question(_file(), "and by region?", history="User: total sales")
+    )
+    assert response == "by region: 10"
+    assert seen["query"] == "and by region?"
+    assert "User: total sales" in seen["prompt"]
+    assert cacheable and used_history
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from backend.dtypes import optimize_dtypes
+
+
+def test_integers_narrow_to_32_bits():
+    df = pd.DataFrame({"small": np.arange(100, dtype=np.int64), "big": np.array([0, 2**40], dtype=np.int64).repeat(50)})
+    result, report = optimize_dtypes(df)
+    assert result["small"].dtype == np.int32
+    assert result["big"].dtype == np.int64
+    assert report["converted"] == {"small": "int64 -> int32"}
+    assert report["bytes_after"] < report["bytes_before"]
+
+
+def test_floats_are_kept_by_default():
+    df = pd.DataFrame({"x": [0.1, 0.2, 0.3]})
+    result, report = optimize_dtypes(df)
+    assert result["x"].dtype == np.float64
+    assert report["converted"] == {}
+
+
+def test_low_cardinality_text_becomes_category():
+    df = pd.DataFrame({"region": ["north", "south"] * 50, "id": [f"row-{i}" for i in range(100)]})
+    result, report = optimize_dtypes(df)
+    assert isinstance(result["region"].dtype, pd.CategoricalDtype)
+    assert not isinstance(result["id"].dtype, pd.CategoricalDtype)
+    assert (result["region"] == df["region"]).all()
+
+
+def test_date_strings_become_datetimes():
+    df = pd.DataFrame({"day": ["2024-01-01", "2024-01-02", "2024-02-29"], "mixed": ["2024-01-01", "soon", "2024-01-03"]})
+    result, _ = optimize_dtypes(df)
+    assert pd.api.types.is_datetime64_any_dtype(result["day"])
+    assert result["day"].iloc[2] == pd.Timestamp("2024-02-29")
+    assert not pd.api.types.is_datetime64_any_dtype(result["mixed"])
+
+
+def test_input_frame_is_not_modified():
+    df = pd.DataFrame({"n": np.arange(10, dtype=np.int64)})
+    optimize_dtypes(df)
+    assert df["n"].dtype == np.int64
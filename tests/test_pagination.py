@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from fastapi import Response
+
+from backend.pagination import NEXT_CURSOR_HEADER, keyset_page
+
+
+def rows(*ids):
+    return [SimpleNamespace(id=i) for i in ids]
+
+
+def test_page_with_more_rows_sets_cursor():
+    response = Response()
+    # Fetched newest first, one past the limit
+    page = keyset_page(rows(9, 8, 7, 6), 3, response)
+    assert [r.id for r in page] == [7, 8, 9]
+    assert response.headers[NEXT_CURSOR_HEADER] == "7"
+
+
+def test_last_page_has_no_cursor():
+    response = Response()
+    page = keyset_page(rows(3, 2), 3, response)
+    assert [r.id for r in page] == [2, 3]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_unlimited_returns_everything():
+    response = Response()
+    page = keyset_page(rows(3, 2, 1), None, response)
+    assert [r.id for r in page] == [1, 2, 3]
+    assert NEXT_CURSOR_HEADER not in response.headers
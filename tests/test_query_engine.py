@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from backend.query_engine import answer_dataframe, normalize_question, resolve_column
+
+
+@pytest.fixture
+def sales():
+    return pd.DataFrame({
+        "region": ["north", "south", "north", "east", "south", "north"],
+        "unit_price": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+        "quantity": [1, 2, 3, 4, 5, 6],
+    })
+
+
+def test_normalize_question():
+    assert normalize_question("What is the total Sales?") == "total sales"
+    assert normalize_question("Can you please show me the columns.") == "columns"
+
+
+def test_resolve_column(sales):
+    assert resolve_column(sales, "unit prices") == "unit_price"
+    assert resolve_column(sales, "the regions") == "region"
+    assert resolve_column(sales, "revenue") is None
+
+
+def test_row_count_and_columns(sales):
+    assert answer_dataframe(sales, "How many rows are there?") == "The dataset has **6** rows."
+    assert answer_dataframe(sales, "what are the columns").startswith("The dataset has 3 columns")
+
+
+def test_scalar_aggregates(sales):
+    assert answer_dataframe(sales, "total quantity") == "Total of **quantity**: 21"
+    assert answer_dataframe(sales, "What's the average unit price?") == "Average of **unit_price**: 35"
+    assert answer_dataframe(sales, "max unit price") == "Maximum of **unit_price**: 60"
+
+
+def test_grouped_aggregate(sales):
+    answer = answer_dataframe(sales, "sum of quantity by region")
+    assert answer.startswith("Total of **quantity** by **region**:")
+    lines = answer.splitlines()
+    # Largest group first
+    assert "north" in lines[4] and "10" in lines[4]
+
+
+def test_top_and_unique(sales):
+    answer = answer_dataframe(sales, "top 1 region by quantity")
+    assert answer.startswith("Top 1 **region** by total **quantity**:")
+    assert "north" in answer and "south" not in answer
+    assert answer_dataframe(sales, "how many unique regions") == "**region** has **3** unique values."
+
+
+def test_unparsed_questions_fall_back(sales):
+    assert answer_dataframe(sales, "plot quantity over time") is None
+    assert answer_dataframe(sales, "average revenue") is None
+    # Text columns have no mean
+    assert answer_dataframe(sales, "average region") is None
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from backend import response_cache as response_cache_module
+from backend.agent_factory import stopped_early
+from backend.models import File
+from backend.response_cache import ResponseCache, normalize_question
+from backend.routers import chat
+
+
+def make_cache(**kwargs):
+    options = {"ttl_seconds": 60, "max_entries": 10, "semantic": False, "similarity": 0.9}
+    options.update(kwargs)
+    return ResponseCache(**options)
+
+
+def test_normalized_question_hits():
+    cache = make_cache()
+    cache.put("hash", "What is the total Sales?", "42")
+    assert normalize_question("what is the total sales") == "what is the total sales"
+    assert cache.get("hash", "what is the  total sales") == ("42", "exact")
+    assert cache.get("other", "What is the total Sales?") is None
+
+
+def test_expired_entries_are_dropped(monkeypatch):
+    cache = make_cache(ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr(response_cache_module.time, "time", lambda: now[0])
+    cache.put("hash", "question", "answer")
+    now[0] += 5
+    assert cache.get("hash", "question") == ("answer", "exact")
+    now[0] += 10
+    assert cache.get("hash", "question") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = make_cache(max_entries=2)
+    cache.put("hash", "a", "1")
+    cache.put("hash", "b", "2")
+    cache.get("hash", "a")
+    cache.put("hash", "c", "3")
+    assert cache.get("hash", "b") is None
+    assert cache.get("hash", "a") == ("1", "exact")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_forgets_one_file():
+    cache = make_cache()
+    cache.put("old", "question", "stale")
+    cache.put("new", "question", "fresh")
+    cache.invalidate("old")
+    assert cache.get("old", "question") is None
+    assert cache.get("new", "question") == ("fresh", "exact")
+
+
+def test_stopped_early():
+    assert stopped_early({"output": "Agent stopped due to iteration limit or time limit."})
+    assert stopped_early({"output": "Agent stopped due to max iterations.\n"})
+    assert not stopped_early({"output": "The total is 42."})
+
+
+def _ask(monkeypatch, run_result):
+    cache = make_cache()
+    monkeypatch.setattr(chat, "response_cache", cache)
+
+    async def run_question(file, message, callbacks=None, history=""):
+        return run_result
+
+    monkeypatch.setattr(chat, "run_question", run_question)
+    file = File(id=1, filename="sales.csv", filepath="sales.csv", content_hash="hash", owner_id=1)
+    first = asyncio.run(chat.answer_question(file, "total sales"))
+    second = asyncio.run(chat.answer_question(file, "total sales"))
+    return first, second
+
+
+def test_answers_are_cached(monkeypatch):
+    first, second = _ask(monkeypatch, ("42", True, False))
+    assert first == {"response": "42", "cached": False, "cache": None}
+    assert second == {"response": "42", "cached": True, "cache": "exact"}
+
+
+def test_failures_are_not_cached(monkeypatch):
+    first, second = _ask(monkeypatch, ("Error processing request: LLM request failed", False, False))
+    assert not first["cached"]
+    assert not second["cached"]
+
+
+def test_agent_errors_are_not_cacheable(monkeypatch):
+    monkeypatch.setattr(chat.query_engine, "answer", lambda *args: None)
+
+    def get_agent(*args, **kwargs):
+        raise RuntimeError("LLM request failed: connection refused")
+
+    monkeypatch.setattr(chat, "get_agent", get_agent)
+    file = File(id=1, filename="sales.csv", filepath="sales.csv", content_hash="hash", owner_id=1)
+    response, cacheable, used_history = asyncio.run(chat.run_question(file, "plot sales"))
+    assert response.startswith("Error processing request")
+    assert not cacheable
+
+
+def test_llm_failures_raise(monkeypatch):
+    from backend import llm
+
+    def generate(prompt, stop=None):
+        raise RuntimeError("connection refused")
+
+    monkeypatch.setattr(llm.inference_client, "generate", generate)
+    with pytest.raises(llm.LLMError, match="connection refused"):
+        llm.HuggingFaceLLM().invoke("hello")
@@ -0,0 +1,34 @@
+from langchain_core.documents import Document
+
+from backend.retrieval import reciprocal_rank_fusion, trim_overlaps
+
+
+def chunk(text, start, page=0):
+    return Document(page_content=text, metadata={"source": "report.pdf", "page": page, "start_index": start})
+
+
+def test_rrf_favours_ids_ranked_by_both():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d", "a"]])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c", "d"}
+    assert fused.index("d") > fused.index("a")
+
+
+def test_trim_overlaps_cuts_shared_text():
+    text = "x" * 100 + "y" * 100
+    best = chunk(text[:150], 0)
+    neighbour = chunk(text[100:], 100)
+    kept = trim_overlaps([best, neighbour], min_chars=10)
+    assert kept[0] is best
+    assert kept[1].page_content == "y" * 50
+    assert kept[1].metadata["start_index"] == 150
+
+
+def test_trim_overlaps_drops_covered_chunks():
+    kept = trim_overlaps([chunk("a" * 200, 0), chunk("a" * 50, 100), chunk("a" * 50, 100, page=1)], min_chars=10)
+    assert [d.metadata["page"] for d in kept] == [0, 1]
+
+
+def test_trim_overlaps_keeps_unpositioned_chunks():
+    doc = Document(page_content="text", metadata={})
+    assert trim_overlaps([doc, doc]) == [doc, doc]
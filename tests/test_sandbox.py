@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from backend.sandbox import SandboxPool, _execute
+
+
+def test_execute_evaluates_the_last_statement():
+    namespace = {}
+    assert _execute("x = 2\nx * 21", namespace) == "42"
+    assert _execute("print('hi')", namespace) == "hi\n"
+    assert _execute("```python\nx + 1\n```", namespace) == "3"
+    assert _execute("1 / 0", namespace) == "ZeroDivisionError: division by zero"
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(1)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture(scope="module")
+def csv_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("data") / "sales.csv"
+    pd.DataFrame({"sales": [1, 2, 3]}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_runs_share_variables_only_within_a_run(pool, csv_path):
+    assert pool.run("total = df['sales'].sum()\ntotal", csv_path, token="run-1") == "6"
+    assert pool.run("total * 2", csv_path, token="run-1") == "12"
+    assert pool.run("total", csv_path, token="run-2") == "NameError: name 'total' is not defined"
+    pool.end_run("run-1")
+    assert pool.run("total", csv_path, token="run-1") == "NameError: name 'total' is not defined"
+
+
+def test_columns_added_in_a_run_do_not_leak(pool, csv_path):
+    pool.run("df['double'] = df['sales'] * 2", csv_path, token="run-3")
+    assert pool.run("list(df.columns)", csv_path, token="run-4") == "['sales']"
+
+
+def test_timeout_replaces_the_worker(pool, csv_path):
+    output = pool.run("while True: pass", csv_path, timeout=1)
+    assert output == "TimeoutError: execution took longer than 1 seconds"
+    assert pool.stats()["timeouts"] == 1
+    # The replacement worker picks up the next call
+    assert pool.run("len(df)", csv_path) == "3"